@@ -66,6 +66,25 @@ class TestFlaskApi(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('Contact deleted successfully', response.json().get('message'))
 
+    def test_predict_batch(self):
+        url = "http://127.0.0.1:5000/predict/batch"
+        data = {
+            'columns': {
+                'glucose_level_value': [170.2, 95.0],
+                'finger_stick_value': [101.0, 0.0],
+                'basal_value': [1.5, 1.2],
+                'basis_gsr_value': [0.07, 0.1],
+                'basis_skin_temperature_value': [87.5, 86.0],
+                'bolus_dose': [0.0, 2.0]
+            },
+            'hyperglycemia_threshold': 180,
+            'hypoglycemia_threshold': 100
+        }
+        response = requests.post(url, json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['predictions']), 2)
+        self.assertEqual(len(response.json()['hypoglycemia']), 2)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
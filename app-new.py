@@ -1,7 +1,7 @@
 import base64
 import firebase_admin
 from firebase_admin import auth, credentials, firestore, initialize_app
-from flask import Flask, Blueprint, request, jsonify, render_template, redirect, url_for, send_file, Response
+from flask import Flask, Blueprint, request, jsonify, render_template, redirect, url_for, send_file, Response, stream_with_context
 from flask_cors import CORS
 import json
 import pyrebase
@@ -18,16 +18,29 @@ import time
 import statistics
 import pandas as pd
 import numpy as np
-from keras.models import load_model
-import joblib
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import pytz
-from matplotlib.figure import Figure
 import io
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from chart_data import pressure_chart_data, chart_data_json
+from plot_rendering import render_pressure_chart
+from chart_cache import chart_cache, make_key, data_digest, content_digest
+from downsampling import downsample_series, parse_max_points
+from pagination import encode_cursor, parse_page, read_page, stream_range, wants_page
+from export_stream import FORMATS, export_chunks
+from model_registry import model_registry
+from glucose_inference import predict_single_entry, prediction_batcher, predict_rows, features_from_payload, flag_predictions, parse_threshold
+from pressure_rollups import PressureStats, add_rollup_writes, compute_rollups, rollup_values, read_pressure_stats, rebuild_pressure_rollups
+from pressure_summary import summarize_pressure
+from pressure_store import CHANNELS, PressureValidationError, parse_timestamp, parse_pressure_frame, parse_pressure_samples, store_pressure_samples, read_pressure_samples, iter_pressure_samples, read_latest_pressure_samples, written_sample_indexes
+from pressure_ring import pressure_ring_store
+from live_events import live_event_hub
+from personal_metrics import MetricsValidationError, personal_info_ref, update_personal_metrics, validate_metrics
+from write_coalescer import WriteCoalescer
+from document_updates import update_existing
+from document_cache import document_cache
+from latest_cache import latest_glucose_cache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -103,6 +116,7 @@ def signup():
             'password': password,  # Consider hashing the password
             'patientID': patient_id
         })
+        document_cache.invalidate(user_ref)
 
         user_data = user_ref.get().to_dict()
 
@@ -284,19 +298,8 @@ def get_my_doctor(username):
 def get_all_contacts(username):
     # Returns all emergency contact for the provided username
     try:
-        # Query the contacts subcollection for the given user
-        contacts_ref = db.collection('users').document(username).collection('contacts')
-        contacts_query = contacts_ref.stream()
-
-        # Collect contact data from the documents
-        contacts = []
-        for contact_doc in contacts_query:
-            contact_info = contact_doc.to_dict()
-            contact_info['id'] = contact_doc.id  # Optionally include the document ID
-            contacts.append(contact_info)
-
         # Return the contacts in the response
-        return jsonify({"success": True, "contacts": contacts}), 200
+        return jsonify({"success": True, "contacts": read_contacts(username)}), 200
 
     except Exception as e:
         return jsonify({"success": False, "message": f"An error occurred: {e}"}), 500
@@ -368,19 +371,38 @@ def add_pressure_value(username):
         if pressure_value1 is None:
             return jsonify({"success": False, "message": "Pressure value not provided"}), 400
 
+        received_at = datetime.now(timezone.utc)
+        values = [pressure_value1, pressure_value2, pressure_value3, pressure_value4, pressure_value5, pressure_value6]
+
+        # Single readings always get their own document, whatever PRESSURE_STORAGE_MODE is: merging each one
+        # into a bucket would rewrite the whole bucket per reading. The readers merge both layouts.
+
         # Reference to the Firestore document of the user
         user_ref = db.collection('users').document(username)
 
-        # Add pressure value to user's pressureData collection
-        user_ref.collection('pressureData').add({
+        # Add pressure value to user's pressureData collection, and its rollups in the same batch
+        batch = db.batch()
+        batch.set(user_ref.collection('pressureData').document(), {
             'p1': pressure_value1,
             'p2': pressure_value2,
             'p3': pressure_value3,
             'p4': pressure_value4,
             'p5': pressure_value5,
             'p6': pressure_value6,
-            'timestamp': firestore.SERVER_TIMESTAMP
+            # Same timestamp as the rollups, the ring buffer and the live event, so they all agree on the sample
+            'timestamp': received_at
         })
+        add_rollup_writes(batch, user_ref, compute_rollups([received_at], [rollup_values(values)]))
+        batch.commit()
+
+        # Live plots read the newest samples from memory
+        pressure_ring_store.append(username, [received_at], [rollup_values(values)])
+
+        # Cached charts for this user no longer reflect their data
+        chart_cache.invalidate_user(username)
+
+        # Open dashboards get the reading pushed to them
+        publish_pressure_event(username, [received_at], [rollup_values(values)])
 
         return jsonify({"success": True, "message": "Pressure value added successfully"}), 200
 
@@ -389,6 +411,48 @@ def add_pressure_value(username):
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+# Upper bound on samples per /add_pressure_batch request
+MAX_PRESSURE_BATCH_SAMPLES = int(os.environ.get('MAX_PRESSURE_BATCH_SAMPLES', 10000))
+
+
+@app.route('/add_pressure_batch/<username>', methods=['POST'])
+def add_pressure_batch(username):
+    try:
+        # Validate every sample up front so nothing is written for a malformed request
+        samples = request.json.get('samples')
+        try:
+            timestamps, values = parse_pressure_samples(samples, max_samples=MAX_PRESSURE_BATCH_SAMPLES)
+        except PressureValidationError as e:
+            return jsonify({"success": False, "message": str(e), "errors": e.errors}), 400
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        return store_pressure_batch(username, timestamps, values)
+
+    except Exception as e:
+        # Handle exceptions
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/add_pressure_frame/<username>', methods=['POST'])
+def add_pressure_frame(username):
+    # Same as /add_pressure_batch, but the body is a packed binary frame (application/octet-stream):
+    # a header with the base timestamp and sample rate, then little-endian float32 rows of p1..p6
+    try:
+        try:
+            timestamps, values = parse_pressure_frame(request.get_data(), max_samples=MAX_PRESSURE_BATCH_SAMPLES)
+        except PressureValidationError as e:
+            return jsonify({"success": False, "message": str(e), "errors": e.errors}), 400
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        return store_pressure_batch(username, timestamps, values)
+
+    except Exception as e:
+        # Handle exceptions
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 @app.route('/get_pressure_data/<username>', methods=['GET'])
 def get_pressure_data(username):
     try:
@@ -400,36 +464,40 @@ def get_pressure_data(username):
         start_timestamp = datetime.fromisoformat(start_timestamp_str)
         end_timestamp = datetime.fromisoformat(end_timestamp_str)
 
-        # Convert datetime objects to UTC time
-        # utc_timezone = pytz.utc
-        # start_timestamp_utc = start_timestamp.astimezone(utc_timezone)
-        # end_timestamp_utc = end_timestamp.astimezone(utc_timezone)
-
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
-
-        # Get pressure data collection for the user
-        pressure_data_ref = user_ref.collection('pressureData')
+        # Optional downsampling (max_points=1000&method=lttb|minmax, applied per page) and paging
+        # (page_size and/or cursor, the next_cursor of the previous response)
+        try:
+            max_points, method = parse_max_points(request.args)
+            page_size, cursor = parse_page(request.args) if wants_page(request.args) else (None, None)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        # Samples in the range, unpacked from buckets where they are stored that way
+        next_cursor = None
+        if page_size is not None:
+            # One page at a time, continuing after the last timestamp of the previous page
+            after = cursor[0] if cursor else None
+            timestamps, values = read_pressure_samples(db, username, start_timestamp, end_timestamp, limit=page_size + 1, after=after)
+            if len(timestamps) > page_size:
+                timestamps, values = timestamps[:page_size], values[:page_size]
+                next_cursor = encode_cursor(timestamps[-1])
+        else:
+            timestamps, values = read_pressure_samples(db, username, start_timestamp, end_timestamp)
+        total_points = len(timestamps)
 
-        # Query pressure data collection within the specified time range
-        pressure_data_docs = pressure_data_ref.where('timestamp', '>=', start_timestamp_utc)\
-                                              .where('timestamp', '<=', end_timestamp_utc)\
-                                              .order_by('timestamp')\
-                                              .get()
+        if max_points is not None and total_points > max_points:
+            # One set of points chosen across all six regions
+            keep = downsample_series(timestamps, values, max_points, method)
+            timestamps = [timestamps[index] for index in keep]
+            values = values[keep]
 
         pressure_data = []
-        for doc in pressure_data_docs:
-            pressure_data.append({
-                'p1': doc.get('p1'),
-                'p2': doc.get('p2'),
-                'p3': doc.get('p3'),
-                'p4': doc.get('p4'),
-                'p5': doc.get('p5'),
-                'p6': doc.get('p6'),
-                'timestamp': doc.get('timestamp')
-            })
+        for timestamp, row in zip(timestamps, values.tolist()):
+            # Channels missing from a stored sample come back as None, as before
+            pressure_data.append(dict(zip(CHANNELS, [None if np.isnan(value) else value for value in row]), timestamp=timestamp))
 
-        return jsonify({"success": True, "pressureData": pressure_data}), 200
+        return jsonify({"success": True, "pressureData": pressure_data, "totalPoints": total_points,
+                        "downsampled": len(pressure_data) < total_points, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -448,47 +516,97 @@ def get_average_pressure(username):
         start_timestamp = datetime.fromisoformat(start_timestamp_str)
         end_timestamp = datetime.fromisoformat(end_timestamp_str)
 
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
+        # Count, sum, min, max and sum of squares for the range, mostly from pre-aggregated rollups
+        region_stats = read_pressure_stats(db, username, start_timestamp, end_timestamp).region(foot_region)
 
-        # Get pressure data collection for the user
-        pressure_data_ref = user_ref.collection('pressureData')
+        return jsonify({"success": True, **average_pressure_summary(region_stats)}), 200
 
-        # Query pressure data collection within the specified time range
-        pressure_data_docs = pressure_data_ref.where('timestamp', '>=', start_timestamp)\
-                                              .where('timestamp', '<=', end_timestamp)\
-                                              .order_by('timestamp')\
-                                              .get()
+    except Exception as e:
+        # Handle exceptions
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        pressure_data = []
-        for doc in pressure_data_docs:
-            pressure_data.append({
-                'p1': doc.get('p1'),
-                'p2': doc.get('p2'),
-                'p3': doc.get('p3'),
-                'p4': doc.get('p4'),
-                'p5': doc.get('p5'),
-                'p6': doc.get('p6'),
-                'timestamp': doc.get('timestamp')
-        })
+@app.route('/pressure_summary/<username>', methods=['GET'])
+def pressure_summary(username):
+    # Every foot region from one range read, for the heatmap
+    try:
+        # Get start and end timestamps from query parameters
+        start_timestamp = datetime.fromisoformat(request.args.get('start'))
+        end_timestamp = datetime.fromisoformat(request.args.get('end'))
+
+        # Threshold for time-above-threshold (kPa) and which percentiles to report, e.g. percentiles=50,90,99
+        threshold = float(request.args.get('threshold', 200))
+        percentiles = request.args.get('percentiles')
+        if percentiles is not None:
+            percentiles = [float(q) for q in percentiles.split(',') if q.strip()]
+            if any(q < 0 or q > 100 for q in percentiles):
+                return jsonify({"success": False, "message": "percentiles must be between 0 and 100"}), 400
+
+        # One (N, 6) array for the window, unpacked from buckets where they are stored that way
+        timestamps, values = read_pressure_samples(db, username, start_timestamp, end_timestamp)
+        regions = summarize_pressure(timestamps, values, threshold, percentiles)
+
+        for region in regions.values():
+            # Same classification as get_average_pressure
+            average_pressure = 0 if region['count'] == 0 else round(region['mean'], 2)
+            region['diabeticUlcerationRisk'] = ulceration_risk(average_pressure, region['count'])
+
+        return jsonify({"success": True, "sampleCount": len(timestamps), "threshold": threshold, "regions": regions}), 200
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        # Handle exceptions
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        # Extract all values for specified region
-        p_values = []
-        for pressure in pressure_data:
-            p_values.append(pressure[foot_region])
-        
-        if(len(p_values) == 0):
-            average_pressure = 0
-            diabetic_ulceration_risk = 'Unknown'
-        else:
-            # Calculate the average of p_values and round it to 2 decimal places
-            average_pressure = round(statistics.mean(p_values), 2)
-            if(average_pressure <= 200):
-                diabetic_ulceration_risk = 'Low'
-            elif (average_pressure > 200):
-                diabetic_ulceration_risk = 'High'
+@app.route('/export/<username>', methods=['GET'])
+def export_history(username):
+    # Full pressure or glucose history, streamed as NDJSON or CSV; an interrupted download resumes with
+    # since=<timestamp of the last record received>
+    try:
+        data_type = request.args.get('type', 'pressure')
+        export_format = request.args.get('format', 'ndjson')
+        if data_type not in ('pressure', 'glucose'):
+            return jsonify({"success": False, "message": "type must be pressure or glucose"}), 400
+        if export_format not in FORMATS:
+            return jsonify({"success": False, "message": "format must be one of " + ", ".join(FORMATS)}), 400
+
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    if data_type == 'pressure':
+        # Oldest first across per-sample documents and buckets
+        fields = ['timestamp'] + CHANNELS
+        records = (dict(timestamp=timestamp, **dict(zip(CHANNELS, row))) for timestamp, row in iter_pressure_samples(db, username, since, until))
+    else:
+        fields = ['timestamp', 'glucose']
+        glucose_data_ref = db.collection('users').document(username).collection('glucoseData')
+        if until is not None:
+            glucose_data_ref = glucose_data_ref.where('timestamp', '<=', until)
+        records = ({'timestamp': doc.get('timestamp'), 'glucose': doc.get('glucose')} for doc in stream_range(glucose_data_ref, after=since))
+
+    # Compressed on the fly when the client accepts gzip
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = Response(stream_with_context(export_chunks(records, export_format, fields, gzip=use_gzip)), mimetype=FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{username}-{data_type}.{export_format}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Don't let a proxy buffer the whole export before passing it on
+    response.headers['X-Accel-Buffering'] = 'no'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/rebuild_pressure_rollups/<username>', methods=['POST'])
+def rebuild_rollups(username):
+    # Backfills (or repairs) the pressure rollups for every day touching the range from the raw samples
+    try:
+        start_timestamp = datetime.fromisoformat(request.json.get('start'))
+        end_timestamp = datetime.fromisoformat(request.json.get('end'))
 
-        return jsonify({"success": True, "averagePressure": average_pressure, "diabeticUlcerationRisk": diabetic_ulceration_risk}), 200
+        rollups_written = rebuild_pressure_rollups(db, username, start_timestamp, end_timestamp)
+
+        return jsonify({"success": True, "rollupsWritten": rollups_written}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -513,6 +631,19 @@ def add_glucose_value(username):
             'timestamp': firestore.SERVER_TIMESTAMP
         })
 
+        # Cached charts for this user no longer reflect their data
+        chart_cache.invalidate_user(username)
+
+        # Write-through: get_latest_glucose answers from memory until the entry expires
+        latest = latest_glucose_reading(glucose_value, datetime.now(timezone.utc))
+        if latest is None:
+            latest_glucose_cache.invalidate(username)
+        else:
+            latest_glucose_cache.put(username, latest, latest['timestamp'])
+
+            # Open dashboards get the reading pushed to them
+            publish_glucose_event(username, latest)
+
         return jsonify({"success": True, "message": "Glucose value added successfully"}), 200
 
     except Exception as e:
@@ -531,6 +662,14 @@ def get_glucose_data(username):
         start_timestamp = datetime.fromisoformat(start_timestamp_str)
         end_timestamp = datetime.fromisoformat(end_timestamp_str)
 
+        # Optional downsampling (max_points=1000&method=lttb|minmax, applied per page) and paging
+        # (page_size and/or cursor, the next_cursor of the previous response)
+        try:
+            max_points, method = parse_max_points(request.args)
+            page_size, cursor = parse_page(request.args) if wants_page(request.args) else (None, None)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
         # Reference to the Firestore document of the user
         user_ref = db.collection('users').document(username)
 
@@ -538,10 +677,14 @@ def get_glucose_data(username):
         glucose_data_ref = user_ref.collection('glucoseData')
 
         # Query glucose data collection within the specified time range
-        glucose_data_docs = glucose_data_ref.where('timestamp', '>=', start_timestamp)\
-                                              .where('timestamp', '<=', end_timestamp)\
-                                              .order_by('timestamp')\
-                                              .get()
+        glucose_data_query = glucose_data_ref.where('timestamp', '>=', start_timestamp)\
+                                               .where('timestamp', '<=', end_timestamp)
+        next_cursor = None
+        if page_size is not None:
+            # One page at a time, continuing after the cursor from the previous page
+            glucose_data_docs, next_cursor = read_page(glucose_data_query, page_size, cursor)
+        else:
+            glucose_data_docs = glucose_data_query.order_by('timestamp').get()
 
         glucose_data = []
         for doc in glucose_data_docs:
@@ -549,8 +692,16 @@ def get_glucose_data(username):
                 'glucose': doc.get('glucose'),
                 'timestamp': doc.get('timestamp')
             })
+        total_points = len(glucose_data)
+
+        if max_points is not None and total_points > max_points:
+            # Readings that aren't numbers count as gaps when choosing points
+            glucose_values = pd.to_numeric(pd.Series([data['glucose'] for data in glucose_data], dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+            keep = downsample_series([data['timestamp'] for data in glucose_data], glucose_values, max_points, method)
+            glucose_data = [glucose_data[index] for index in keep]
 
-        return jsonify({"success": True, "glucoseData": glucose_data}), 200
+        return jsonify({"success": True, "glucoseData": glucose_data, "totalPoints": total_points,
+                        "downsampled": len(glucose_data) < total_points, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -559,19 +710,12 @@ def get_glucose_data(username):
 @app.route('/get_latest_glucose/<username>', methods=['GET', 'POST'])
 def get_latest_glucose(username):
     try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
+        latest = read_latest_glucose(username)
+        if latest is None:
+            return jsonify({"success": False, "message": "No glucose readings found"}), 404
 
-        # Get glucose data collection for the user
-        glucose_data_ref = user_ref.collection('glucoseData')
-
-        # Query glucose data collection for the most recent entry
-        latest_glucose_doc = glucose_data_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1).get()
-
-        sweat_glucose = round(latest_glucose_doc[0].get('glucose'), 2)
-        blood_glucose = round(calculate_blood_glucose(sweat_glucose), 2)
-
-        return jsonify({"success": True, "sweat_glucose": sweat_glucose, "blood_glucose": blood_glucose}), 200
+        return jsonify({"success": True, "sweat_glucose": latest['sweat_glucose'], "blood_glucose": latest['blood_glucose'],
+                        "timestamp": latest['timestamp']}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -617,18 +761,22 @@ def get_meals(username):
         start_timestamp = datetime.fromisoformat(start_timestamp_str)
         end_timestamp = datetime.fromisoformat(end_timestamp_str)
 
+        # Page through older meals with the next_cursor of the previous response
+        try:
+            page_size, cursor = parse_page(request.args, default_page_size=10)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
         # Reference to the Firestore document of the user
         user_ref = db.collection('users').document(username)
 
         # Get meals collection for the user
         meals_ref = user_ref.collection('meals')
 
-        # Query meals collection within the specified time range
-        meals_docs = meals_ref.where('timestamp', '>=', start_timestamp)\
-                              .where('timestamp', '<=', end_timestamp)\
-                              .order_by('timestamp', direction='DESCENDING')\
-                              .limit(10)\
-                              .get()
+        # Query meals collection within the specified time range, newest first, one page (10 meals by default) at a time
+        meals_query = meals_ref.where('timestamp', '>=', start_timestamp)\
+                               .where('timestamp', '<=', end_timestamp)
+        meals_docs, next_cursor = read_page(meals_query, page_size, cursor, direction='DESCENDING')
 
         meals_data = []
         for doc in meals_docs:
@@ -638,7 +786,7 @@ def get_meals(username):
                 'meal_description': doc.get('meal_description')
             })
 
-        return jsonify({"success": True, "mealsData": meals_data}), 200
+        return jsonify({"success": True, "mealsData": meals_data, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -647,39 +795,15 @@ def get_meals(username):
 
 @app.route('/add_blood_glucose_level', methods=['POST'])
 def add_blood_glucose_level():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        bloodGlucoseLevel = request.json.get('bloodGlucoseLevel')
-        
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        
-        if personal_info_data:
-           personal_metrics_ref.update({'blood_glucose_level': bloodGlucoseLevel})
-           # Return success response
-           return jsonify({"success": True}), 200
+    return update_personal_metric('bloodGlucoseLevel', 'blood_glucose_level')
 
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-        
 @app.route('/get_blood_glucose_level/<username>', methods=['GET'])
 def get_blood_glucose_level(username):
     try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        # Get the user document data
-        user_doc = user_ref.get()
+        user_data = read_personal_info(username)
         # Check if the document exists
-        if user_doc.exists:
+        if user_data is not None:
             # Get specific field from user document data
-            user_data = user_doc.to_dict()
             blood_glucose_level = user_data.get('blood_glucose_level')
             return jsonify({"success": True, "data": {"blood_glucose_level": blood_glucose_level}}), 200
         else:
@@ -691,36 +815,15 @@ def get_blood_glucose_level(username):
 
 @app.route('/update_predicted_hypoglycemia', methods=['POST'])
 def update_predicted_hypoglycemia():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        predicted_hypoglycemia = request.json.get('predicted_hypoglycemia')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'predicted_hypoglycemia': predicted_hypoglycemia})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
+    return update_personal_metric('predicted_hypoglycemia', 'predicted_hypoglycemia')
 
 @app.route('/get_predicted_hypoglycemia/<username>', methods=['GET'])
 def get_predicted_hypoglycemia(username):
     try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        # Get the user document data
-        user_doc = user_ref.get()
+        user_data = read_personal_info(username)
         # Check if the document exists
-        if user_doc.exists:
+        if user_data is not None:
             # Get specific field from user document data
-            user_data = user_doc.to_dict()
             predicted_hypoglycemia = user_data.get('predicted_hypoglycemia')
             return jsonify({"success": True, "data": {"predicted_hypoglycemia": predicted_hypoglycemia}}), 200
         else:
@@ -732,36 +835,15 @@ def get_predicted_hypoglycemia(username):
     
 @app.route('/update_predicted_hyperglycemia', methods=['POST'])
 def update_predicted_hyperglycemia():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        predicted_hyperglycemia = request.json.get('predicted_hyperglycemia')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'predicted_hyperglycemia': predicted_hyperglycemia})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
+    return update_personal_metric('predicted_hyperglycemia', 'predicted_hyperglycemia')
 
 @app.route('/get_predicted_hyperglycemia/<username>', methods=['GET'])
 def get_predicted_hyperglycemia(username):
     try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        # Get the user document data
-        user_doc = user_ref.get()
+        user_data = read_personal_info(username)
         # Check if the document exists
-        if user_doc.exists:
+        if user_data is not None:
             # Get specific field from user document data
-            user_data = user_doc.to_dict()
             predicted_hyperglycemia = user_data.get('predicted_hyperglycemia')
             return jsonify({"success": True, "data": {"predicted_hyperglycemia": predicted_hyperglycemia}}), 200
         else:
@@ -773,675 +855,187 @@ def get_predicted_hyperglycemia(username):
     
 @app.route('/update_height', methods=['POST'])
 def update_height():
+    return update_personal_metric('height', 'height')
+
+@app.route('/update_weight', methods=['POST'])
+def update_weight():
+    return update_personal_metric('weight', 'weight')
+
+@app.route('/update_finger_stick_value', methods=['POST'])
+def update_finger_stick_value():
+    return update_personal_metric('finger_stick_value', 'finger_stick_value')
+
+@app.route('/update_basal_value', methods=['POST'])
+def update_basal_value():
+    return update_personal_metric('basal_value', 'basal_value')
+
+@app.route('/update_basis_gsr_value', methods=['POST'])
+def update_basis_gsr_value():
+    return update_personal_metric('basis_gsr_value', 'basis_gsr_value')
+
+@app.route('/update_basis_skin_temperature_value', methods=['POST'])
+def update_basis_skin_temperature_value():
+    return update_personal_metric('basis_skin_temperature_value', 'basis_skin_temperature_value')
+
+@app.route('/update_bolus_dose', methods=['POST'])
+def update_bolus_dose():
+    return update_personal_metric('bolus_dose', 'bolus_dose')
+
+@app.route('/update_insulin_dosage', methods=['POST'])
+def update_insulin_dosage():
+    return update_personal_metric('insulinDosage', 'insulin_dosage')
+
+@app.route('/update_allergies', methods=['POST'])
+def update_allergies():
+    return update_personal_metric('allergies', 'allergies')
+
+@app.route('/update_insulin_type', methods=['POST'])
+def update_insulin_type():
+    return update_personal_metric('insulin_type', 'insulin_type')
+
+@app.route('/update_physical_activity', methods=['POST'])
+def update_physical_activity():
+    return update_personal_metric('physical_activity', 'physical_activity')
+
+@app.route('/update_activity_intensity', methods=['POST'])
+def update_activity_intensity():
+    return update_personal_metric('activity_intensity', 'activity_intensity')
+
+@app.route('/update_activity_duration', methods=['POST'])
+def update_activity_duration():
+    return update_personal_metric('activity_duration', 'activity_duration')
+
+@app.route('/update_stress_level', methods=['POST'])
+def update_stress_level():
+    return update_personal_metric('stress_level', 'stress_level')
+
+@app.route('/update_illness', methods=['POST'])
+def update_illness():
+    return update_personal_metric('illness', 'illness')
+
+@app.route('/update_hormonal_changes', methods=['POST'])
+def update_hormonal_changes():
+    return update_personal_metric('hormonal_changes', 'hormonal_changes')
+
+@app.route('/update_alcohol_consumption', methods=['POST'])
+def update_alcohol_consumption():
+    return update_personal_metric('alcohol_consumption', 'alcohol_consumption')
+
+@app.route('/update_medication', methods=['POST'])
+def update_medication():
+    return update_personal_metric('medication', 'medication')
+
+@app.route('/update_medication_dosage', methods=['POST'])
+def update_medication_dosage():
+    return update_personal_metric('medication_dosage', 'medication_dosage')
+
+@app.route('/update_weather_conditions', methods=['POST'])
+def update_weather_conditions():
+    return update_personal_metric('weather_conditions', 'weather_conditions')
+
+# Slider bursts of personal-metric updates become one Firestore write per window; 0 writes every update directly
+personal_metrics_writes = WriteCoalescer(lambda username, fields: write_personal_metrics(username, fields),
+                                         window_seconds=float(os.environ.get('PERSONAL_METRICS_COALESCE_MS', 300)) / 1000)
+# Buffered updates are written before the worker exits
+atexit.register(personal_metrics_writes.flush_all)
+
+
+@app.route('/personal_metrics/<username>', methods=['PATCH'])
+def patch_personal_metrics(username):
+    # Any subset of personal metrics, e.g. a whole settings page, validated and written in one update
+    return apply_personal_metrics(username, request.json)
+
+@app.route('/get_personal_metrics/<username>', methods=['GET', 'POST'])
+def get_personal_metrics(username):
     try:
-        # Parse the request data
-        username = request.json.get('username')
-        height = request.json.get('height')
+        personal_data = read_personal_info(username)
         # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'height': height})
-           # Return success response
-           return jsonify({"success": True}), 200
+        if personal_data is not None:
+            return jsonify({"success": True, "data": personal_data}), 200  # Set success to True and include data
         else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
+            return jsonify({"success": False, "message": "Personal metrics not found"}), 404
     except Exception as e:
         # Handle exceptions
         return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_weight', methods=['POST'])
-def update_weight():
+
+@app.route('/update_name', methods=['POST'])
+def update_name():
+    return update_profile_field('name', 'fullName')
+
+@app.route('/update_email', methods=['POST'])
+def update_email():
+    return update_profile_field('email', 'email')
+
+@app.route('/update_phone_number', methods=['POST'])
+def update_phone_number():
+    return update_profile_field('phoneNumber', 'phoneNumber')
+
+@app.route('/update_date_of_birth', methods=['POST'])
+def update_date_of_birth():
+    return update_profile_field('dateOfBirth', 'dateOfBirth')
+
+@app.route('/update_emergency_contact', methods=['POST'])
+def update_emergency_contact():
+    return update_profile_field('emergencyContact', 'emergencyContact')
+
+@app.route('/get_profile_data/<username>', methods=['GET'])
+def get_profile_data(username):
     try:
-        # Parse the request data
-        username = request.json.get('username')
-        weight = request.json.get('weight')
+        user_data = read_profile(username)
         # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'weight': weight})
-           # Return success response
-           return jsonify({"success": True}), 200
+        if user_data is not None:
+            return jsonify({"success": True, "data": user_data}), 200  # Set success to True and include data
         else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
+            return jsonify({"success": False, "message": "User not found"}), 404
+
     except Exception as e:
         # Handle exceptions
         return jsonify({"success": False, "message": str(e)}), 500
     
-@app.route('/update_finger_stick_value', methods=['POST'])
-def update_finger_stick_value():
+@app.route('/update_view_activity', methods=['POST'])
+def update_view_activity():
+    return update_profile_field('value', 'view_activity')
+
+@app.route('/get_view_activity/<username>', methods=['GET'])
+def get_view_activity(username):
     try:
-        # Parse the request data
-        username = request.json.get('username')
-        finger_stick_value = request.json.get('finger_stick_value')
+        user_data = read_profile(username)
         # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'finger_stick_value': finger_stick_value})
-           # Return success response
-           return jsonify({"success": True}), 200
+        if user_data is not None:
+            return jsonify({"success": True, "view_activity": user_data['view_activity']}), 200  # Set success to True and include data
         else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
+            return jsonify({"success": False, "message": "User not found"}), 404
     except Exception as e:
         # Handle exceptions
         return jsonify({"success": False, "message": str(e)}), 500
     
-@app.route('/update_basal_value', methods=['POST'])
-def update_basal_value():
+@app.route('/update_view_meals', methods=['POST'])
+def update_view_meals():
+    return update_profile_field('value', 'view_meals')
+
+@app.route('/get_view_meals/<username>', methods=['GET'])
+def get_view_meals(username):
     try:
-        # Parse the request data
-        username = request.json.get('username')
-        basal_value = request.json.get('basal_value')
+        user_data = read_profile(username)
         # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'basal_value': basal_value})
-           # Return success response
-           return jsonify({"success": True}), 200
+        if user_data is not None:
+            return jsonify({"success": True, "view_meals": user_data['view_meals']}), 200  # Set success to True and include data
         else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_basis_gsr_value', methods=['POST'])
-def update_basis_gsr_value():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        basis_gsr_value = request.json.get('basis_gsr_value')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'basis_gsr_value': basis_gsr_value})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_basis_skin_temperature_value', methods=['POST'])
-def update_basis_skin_temperature_value():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        basis_skin_temperature_value = request.json.get('basis_skin_temperature_value')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'basis_skin_temperature_value': basis_skin_temperature_value})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_bolus_dose', methods=['POST'])
-def update_bolus_dose():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        bolus_dose = request.json.get('bolus_dose')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'bolus_dose': bolus_dose})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-    
-@app.route('/update_insulin_dosage', methods=['POST'])
-def update_insulin_dosage():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        insulinDosage = request.json.get('insulinDosage')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'insulin_dosage': insulinDosage})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_allergies', methods=['POST'])
-def update_allergies():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        allergies = request.json.get('allergies')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'allergies': allergies})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_insulin_type', methods=['POST'])
-def update_insulin_type():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        insulin_type = request.json.get('insulin_type')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'insulin_type': insulin_type})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_physical_activity', methods=['POST'])
-def update_physical_activity():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        physical_activity = request.json.get('physical_activity')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'physical_activity': physical_activity})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_activity_intensity', methods=['POST'])
-def update_activity_intensity():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        activity_intensity = request.json.get('activity_intensity')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'activity_intensity': activity_intensity})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_activity_duration', methods=['POST'])
-def update_activity_duration():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        activity_duration = request.json.get('activity_duration')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'activity_duration': activity_duration})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_stress_level', methods=['POST'])
-def update_stress_level():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        stress_level = request.json.get('stress_level')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'stress_level': stress_level})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_illness', methods=['POST'])
-def update_illness():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        illness = request.json.get('illness')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'illness': illness})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_hormonal_changes', methods=['POST'])
-def update_hormonal_changes():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        hormonal_changes = request.json.get('hormonal_changes')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'hormonal_changes': hormonal_changes})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_alcohol_consumption', methods=['POST'])
-def update_alcohol_consumption():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        alcohol_consumption = request.json.get('alcohol_consumption')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'alcohol_consumption': alcohol_consumption})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_medication', methods=['POST'])
-def update_medication():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        medication = request.json.get('medication')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'medication': medication})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_medication_dosage', methods=['POST'])
-def update_medication_dosage():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        medication_dosage = request.json.get('medication_dosage')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'medication_dosage': medication_dosage})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_weather_conditions', methods=['POST'])
-def update_weather_conditions():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        weather_conditions = request.json.get('weather_conditions')
-        # Check if the document exists
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        personal_info_data = personal_metrics_ref.get().to_dict()
-        if personal_info_data:
-           personal_metrics_ref.update({'weather_conditions': weather_conditions})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404  
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/get_personal_metrics/<username>', methods=['GET', 'POST'])
-def get_personal_metrics(username):
-    try:
-        # Reference to the Firestore document of the user
-        personal_metrics_ref = db.collection('users').document(username).collection('personal-metrics').document('personal-info')
-        # Get the user document data
-        personal_metrics_doc = personal_metrics_ref.get()
-        # Check if the document exists
-        if personal_metrics_doc.exists:
-            personal_data = personal_metrics_doc.to_dict()
-            return jsonify({"success": True, "data": personal_data}), 200  # Set success to True and include data
-        else:
-            return jsonify({"success": False, "message": "Personal metrics not found"}), 404
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-
-@app.route('/update_name', methods=['POST'])
-def update_name():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        name = request.json.get('name')
-        
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        
-        if profile_data:
-           users_ref.update({'fullName': name})
-           # Return success response
-           return jsonify({"success": True}), 200
-
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_email', methods=['POST'])
-def update_email():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        email = request.json.get('email')
-        
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        
-        if profile_data:
-           users_ref.update({'email': email})
-           # Return success response
-           return jsonify({"success": True}), 200
-
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_phone_number', methods=['POST'])
-def update_phone_number():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        phoneNumber = request.json.get('phoneNumber')
-        
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        
-        if profile_data:
-           users_ref.update({'phoneNumber': phoneNumber})
-           # Return success response
-           return jsonify({"success": True}), 200
-
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-
-@app.route('/update_date_of_birth', methods=['POST'])
-def update_date_of_birth():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        dateOfBirth = request.json.get('dateOfBirth')
-        
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        
-        if profile_data:
-           users_ref.update({'dateOfBirth': dateOfBirth})
-           # Return success response
-           return jsonify({"success": True}), 200
-
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_emergency_contact', methods=['POST'])
-def update_emergency_contact():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        emergencyContact = request.json.get('emergencyContact')
-        
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        
-        if profile_data:
-           users_ref.update({'emergencyContact': emergencyContact})
-           # Return success response
-           return jsonify({"success": True}), 200
-
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-        
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/get_profile_data/<username>', methods=['GET'])
-def get_profile_data(username):
-    try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
-
-        # Get the user document data
-        user_doc = user_ref.get()
-
-        # Check if the document exists
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            return jsonify({"success": True, "data": user_data}), 200  # Set success to True and include data
-        else:
-            return jsonify({"success": False, "message": "User not found"}), 404
-
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_view_activity', methods=['POST'])
-def update_view_activity():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        value = request.json.get('value')
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        if profile_data:
-           users_ref.update({'view_activity': value})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/get_view_activity/<username>', methods=['GET'])
-def get_view_activity(username):
-    try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
-        # Get the user document data
-        user_doc = user_ref.get()
-        # Check if the document exists
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            return jsonify({"success": True, "view_activity": user_data['view_activity']}), 200  # Set success to True and include data
-        else:
-            return jsonify({"success": False, "message": "User not found"}), 404
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/update_view_meals', methods=['POST'])
-def update_view_meals():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        value = request.json.get('value')
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        if profile_data:
-           users_ref.update({'view_meals': value})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-@app.route('/get_view_meals/<username>', methods=['GET'])
-def get_view_meals(username):
-    try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
-        # Get the user document data
-        user_doc = user_ref.get()
-        # Check if the document exists
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            return jsonify({"success": True, "view_meals": user_data['view_meals']}), 200  # Set success to True and include data
-        else:
-            return jsonify({"success": False, "message": "User not found"}), 404
+            return jsonify({"success": False, "message": "User not found"}), 404
     except Exception as e:
         # Handle exceptions
         return jsonify({"success": False, "message": str(e)}), 500
     
 @app.route('/update_view_feedback', methods=['POST'])
 def update_view_feedback():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        value = request.json.get('value')
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        if profile_data:
-           users_ref.update({'view_feedback': value})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
+    return update_profile_field('value', 'view_feedback')
+
 @app.route('/get_view_feedback/<username>', methods=['GET'])
 def get_view_feedback(username):
     try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
-        # Get the user document data
-        user_doc = user_ref.get()
+        user_data = read_profile(username)
         # Check if the document exists
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
+        if user_data is not None:
             return jsonify({"success": True, "view_feedback": user_data['view_feedback']}), 200  # Set success to True and include data
         else:
             return jsonify({"success": False, "message": "User not found"}), 404
@@ -1451,34 +1045,14 @@ def get_view_feedback(username):
     
 @app.route('/update_notifications', methods=['POST'])
 def update_notifications():
-    try:
-        # Parse the request data
-        username = request.json.get('username')
-        value = request.json.get('value')
-        # Check if the document exists
-        users_ref = db.collection('users').document(username)
-        profile_data = users_ref.get().to_dict()
-        if profile_data:
-           users_ref.update({'notifications': value})
-           # Return success response
-           return jsonify({"success": True}), 200
-        else:
-            # Document doesn't exist, return error response
-            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
-    except Exception as e:
-        # Handle exceptions
-        return jsonify({"success": False, "message": str(e)}), 500
-    
+    return update_profile_field('value', 'notifications')
+
 @app.route('/get_notifications/<username>', methods=['GET'])
 def get_notifications(username):
     try:
-        # Reference to the Firestore document of the user
-        user_ref = db.collection('users').document(username)
-        # Get the user document data
-        user_doc = user_ref.get()
+        user_data = read_profile(username)
         # Check if the document exists
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
+        if user_data is not None:
             return jsonify({"success": True, "notifications": user_data['notifications']}), 200  # Set success to True and include data
         else:
             return jsonify({"success": False, "message": "User not found"}), 404
@@ -1499,110 +1073,384 @@ def serve_plot():
 
     #"2024-01-01T00:00:00"
 
+    if request.args.get('format') == 'json':
+        # Data-only mode: the frontend draws the chart from the series, so nothing is rendered here
+        region_values = [float(data[region]) for data in fetch_pressure_data_internal(username, start_timestamp, end_timestamp, region) if region in data]
+        return jsonify({"success": True, "chart": chart_data_json(pressure_chart_data(region_values[-50:]))}), 200
+
+    # Dashboards poll with identical parameters; serve the last render until it expires or new data arrives
+    cache_key = make_key('plot_pressure', username, region, normalize_timestamp(start_timestamp), normalize_timestamp(end_timestamp))
+    png_bytes = chart_cache.get(cache_key)
+    if png_bytes is not None:
+        return send_file(io.BytesIO(png_bytes), mimetype='image/png', etag=content_digest(png_bytes))
+
     # Directly fetch the pressure data using the internal function
-    print("serve_plot called\n\n")
     pressure_data = fetch_pressure_data_internal(username, start_timestamp, end_timestamp, region)
-    # print("My data: \n\n\n",pressure_data)
-
-    # Extracting 'p4' values
-    print("region: ",region)
-    print()
 
     region_values = [data[region] for data in pressure_data if region in data]
-    print("region values: ", region_values)
 
     # If there are more than 50 values, keep only the last 50
     if len(region_values) > 50:
         region_values = region_values[-50:]
 
-    print("region values 50: ", region_values)
-
     # Convert all values to floats
     region_values_float = [float(value) for value in region_values]
 
     if isinstance(region_values_float, list):
-        # Plot the pressure data and get the image buffer
-        image_buffer = plot_pressure(region_values_float)
-        return send_file(image_buffer, mimetype='image/png')
+        # Identical data points render to an identical image, whoever asked for it
+        render_key = make_key('plot_pressure_render', data_digest(region_values_float))
+        png_bytes = chart_cache.get(render_key)
+        if png_bytes is None:
+            # Plot the pressure data and get the image buffer
+            png_bytes = plot_pressure(region_values_float).getvalue()
+            chart_cache.put(render_key, png_bytes)
+        chart_cache.put(cache_key, png_bytes, username=username)
+        return send_file(io.BytesIO(png_bytes), mimetype='image/png', etag=content_digest(png_bytes))
     else:
         return jsonify({"success": False, "message": "Failed to fetch pressure data"}), 500
     
 
+# Window of the rolling pressure averages pushed to live dashboards, and samples sent per pressure event
+LIVE_ROLLING_WINDOW_SECONDS = int(os.environ.get('LIVE_ROLLING_WINDOW_SECONDS', 60))
+LIVE_MAX_EVENT_SAMPLES = int(os.environ.get('LIVE_MAX_EVENT_SAMPLES', 50))
+
+
+@app.route('/events/<username>', methods=['GET'])
+def live_events(username):
+    # Server-Sent Events: new pressure and glucose readings for this user as they are ingested,
+    # replacing timed polling of get_latest_glucose, get_average_pressure and /plot_pressure
+    response = Response(live_event_hub.stream(username), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Threads for the dashboard's independent Firestore queries
+dashboard_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('DASHBOARD_WORKERS', 8)))
+
+
+@app.route('/dashboard/<username>', methods=['GET'])
+def dashboard(username):
+    # Everything the dashboard shows on first paint in one response. The user and personal-info documents are
+    # one db.get_all round trip (or come from the document cache) while the queries run on a thread pool, so
+    # the response takes as long as the slowest read rather than the sum of a dozen requests
+    try:
+        # Offset-less times are taken as UTC, so they compare with the default window and the stored samples
+        end_timestamp = parse_timestamp(request.args['end']) if 'end' in request.args else datetime.now(timezone.utc)
+        start_timestamp = parse_timestamp(request.args['start']) if 'start' in request.args else end_timestamp - timedelta(days=1)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        # Queries start first so they run while the point reads are in flight
+        futures = {
+            'contacts': dashboard_executor.submit(read_contacts, username),
+            'latestGlucose': dashboard_executor.submit(read_latest_glucose, username),
+            'pressure': dashboard_executor.submit(read_pressure_stats, db, username, start_timestamp, end_timestamp),
+        }
+
+        profile, personal_info = document_cache.get_all(db, [db.collection('users').document(username), personal_info_ref(db, username)])
+        if profile is None:
+            for future in futures.values():
+                future.cancel()
+            return jsonify({"success": False, "message": "User not found"}), 404
+
+        # The dashboard never needs the stored password
+        profile.pop('password', None)
+        personal_info = with_pending_metrics(username, personal_info)
+
+        # A failed section is reported in errors instead of failing the whole page
+        results, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = None
+                errors[name] = str(e)
+
+        pressure = None
+        if results['pressure'] is not None:
+            pressure = {
+                "start": start_timestamp.isoformat(),
+                "end": end_timestamp.isoformat(),
+                "regions": {channel: average_pressure_summary(results['pressure'].region(channel)) for channel in CHANNELS}
+            }
+        predictions = None
+        if personal_info is not None:
+            predictions = {field: personal_info.get(field) for field in ('blood_glucose_level', 'predicted_hypoglycemia', 'predicted_hyperglycemia')}
+
+        return jsonify({
+            "success": True,
+            "profile": profile,
+            "viewFlags": {field: profile.get(field) for field in ('view_activity', 'view_meals', 'view_feedback', 'notifications')},
+            "myDoctor": profile.get('myDoctor'),
+            "personalMetrics": personal_info,
+            "predictions": predictions,
+            "latestGlucose": results['latestGlucose'],
+            "contacts": results['contacts'],
+            "pressure": pressure,
+            "errors": errors
+        }), 200
+
+    except Exception as e:
+        # Handle exceptions
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/model_status', methods=['GET'])
+def model_status():
+    # Reports which model version this worker has loaded, how long it took and its memory footprint
+    try:
+        if request.args.get('reload') == 'true':
+            model_registry.reload()
+        return jsonify({"success": True, "model": model_registry.stats(), "batching": prediction_batcher.stats(), "chartCache": chart_cache.stats(),
+                        "pressureRing": pressure_ring_store.stats(), "liveEvents": live_event_hub.stats(),
+                        "latestGlucose": latest_glucose_cache.stats(), "personalMetricsWrites": personal_metrics_writes.stats(),
+                        "documentCache": document_cache.stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    # Scores many feature rows in one vectorized scaler and model pass, e.g. to backfill historical data
+    try:
+        request_data = request.json
+        try:
+            X_input = features_from_payload(request_data)
+            hyperglycemia_threshold = parse_threshold(request_data, 'hyperglycemia_threshold')
+            hypoglycemia_threshold = parse_threshold(request_data, 'hypoglycemia_threshold')
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        predictions = predict_rows(X_input.to_numpy()) if len(X_input) else np.array([])
+        flags = flag_predictions(predictions, hyperglycemia_threshold, hypoglycemia_threshold)
+
+        return jsonify({"success": True, "count": len(predictions), "predictions": predictions.tolist(), **flags}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 """Helper Methods"""
 
 def plot_pressure(training_data):
-    plt.figure(figsize=(12, 7), facecolor='#1b2130')
-    ax = plt.axes()
-    ax.set_facecolor('#1b2130')
-
-
-    timestamps = [x * 5 for x in range(50)]
-    data_to_plot = training_data + [None] * (50 - len(training_data))
-
-    if data_to_plot:
-        plt.plot(timestamps, data_to_plot, label='Insole Recorded Data', color='#007bff', marker='o', markersize=12, linewidth=3, markeredgewidth=2, markeredgecolor='white')
-        valid_indices = [i for i, v in enumerate(data_to_plot) if v is not None]
-        if valid_indices:
-            plt.fill_between(timestamps[:valid_indices[-1]+1], data_to_plot[:valid_indices[-1]+1], color='#007bff', alpha=0.075)
-
-    plt.xticks(timestamps, [str(ts) for ts in timestamps], rotation=45, color='white', fontsize=12)
-    plt.yticks(color='white', fontsize=12)
-
-    if training_data:
-        y_min, y_max = min(training_data), max(training_data)
-        y_range = y_max - y_min
-        plt.ylim(y_min - 0.05 * y_range, y_max + 0.3 * y_range)
-
-    plt.xlabel('Time (seconds)', color='white', fontsize=16, labelpad=20, fontweight='600')
-    plt.ylabel('Pressure Value (kPa)', color='white', fontsize=16, labelpad=20, fontweight='600')
-    # Create the legend
-    legend = plt.legend(facecolor='#1b2130', edgecolor='white', fontsize=16, loc='upper left')
-
-    # Set the color of all the legend text to white
-    for text in legend.get_texts():
-        text.set_color('white')
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_color('white')
-    plt.grid(color='gray', linestyle='--', linewidth=0.5)
-    plt.tight_layout()
-    
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', facecolor=ax.get_facecolor())
-    plt.close()
-    buf.seek(0)
-    return buf
+    # Rendered on a pooled Figure template rather than the global pyplot state
+    return render_pressure_chart(pressure_chart_data(training_data))
+
+def store_pressure_batch(username, timestamps, values):
+    # Batched writes of up to 500 documents (or one transaction per bucket), acknowledged chunk by chunk
+    chunks = store_pressure_samples(db, username, timestamps, values)
+    written = sum(chunk['count'] for chunk in chunks if chunk['success'])
+
+    if written:
+        # Live plots read the newest samples from memory; only what was stored goes in
+        stored = written_sample_indexes(chunks)
+        pressure_ring_store.append(username, [timestamps[index] for index in stored], values[stored])
+
+        # Cached charts for this user no longer reflect their data
+        chart_cache.invalidate_user(username)
+
+        # Open dashboards get what was stored pushed to them
+        publish_pressure_event(username, [timestamps[index] for index in stored], values[stored])
+
+    all_written = written == len(timestamps)
+    return jsonify({
+        "success": all_written,
+        "message": "Pressure values added successfully" if all_written else "Some chunks failed; retry those chunks",
+        "received": len(timestamps),
+        "written": written,
+        "chunks": chunks
+    }), 200 if all_written else 207
+
+def publish_pressure_event(username, timestamps, values):
+    # Skipped entirely when nobody is watching, so ingest pays nothing for the live stream
+    if not live_event_hub.has_subscribers(username) or not len(timestamps):
+        return
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(CHANNELS))
+
+    # Rolling averages over the recent samples held in memory
+    window_start = max(timestamps) - timedelta(seconds=LIVE_ROLLING_WINDOW_SECONDS)
+    rolling = PressureStats.from_values(pressure_ring_store.recent(username, window_start))
+    averages = rolling.mean()
+
+    # A large batch only sends its newest samples; the rest are a /get_pressure_data read away
+    newest = slice(-LIVE_MAX_EVENT_SAMPLES, None)
+    samples = []
+    for timestamp, row in zip(timestamps[newest], values[newest]):
+        sample = {'timestamp': timestamp.isoformat()}
+        sample.update({channel: None if np.isnan(value) else float(value) for channel, value in zip(CHANNELS, row)})
+        samples.append(sample)
+
+    live_event_hub.publish(username, 'pressure', {
+        "received": len(timestamps),
+        "samples": samples,
+        "rollingAverage": {
+            "windowSeconds": LIVE_ROLLING_WINDOW_SECONDS,
+            **{channel: None if np.isnan(averages[index]) else round(float(averages[index]), 2) for index, channel in enumerate(CHANNELS)},
+            "sampleCount": int(rolling.count.max())
+        }
+    })
 
-def fetch_pressure_data_internal(username, start_timestamp_str, end_timestamp_str, region):
+def latest_glucose_reading(glucose_value, timestamp):
+    # Sweat glucose, the blood glucose derived from it and when it was taken; None if the value isn't a number
     try:
-        # Convert string timestamps to datetime objects
-        start_timestamp = datetime.fromisoformat(start_timestamp_str)
-        end_timestamp = datetime.fromisoformat(end_timestamp_str)
+        sweat_glucose = round(float(glucose_value), 2)
+    except (TypeError, ValueError):
+        return None
+    return {"sweat_glucose": sweat_glucose, "blood_glucose": round(calculate_blood_glucose(sweat_glucose), 2), "timestamp": timestamp}
+
+def publish_glucose_event(username, latest):
+    if not live_event_hub.has_subscribers(username):
+        return
+    live_event_hub.publish(username, 'glucose', dict(latest, timestamp=latest['timestamp'].isoformat()))
+
+def apply_personal_metrics(username, fields):
+    try:
+        # Updates within the coalescing window after a write are merged into the next one
+        if not personal_metrics_writes.submit(username, validate_metrics(fields)):
+            return jsonify({"success": False, "message": "Document personal_info does not exist for user: " + username}), 404
+        return jsonify({"success": True}), 200
+    except MetricsValidationError as e:
+        return jsonify({"success": False, "message": str(e), "errors": e.errors}), 400
+    except Exception as e:
+        # Handle exceptions
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def update_personal_metric(request_key, field):
+    # Backs the one-field update routes (/update_height, /add_blood_glucose_level, ...), the form of
+    # PATCH /personal_metrics/<username> kept for existing clients: username and value come in the body,
+    # the value under the route's own key
+    try:
+        username = request.json.get('username')
+        value = request.json.get(request_key)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+    return apply_personal_metrics(username, {field: value})
+
+def write_personal_metrics(username, fields):
+    try:
+        return update_personal_metrics(db, username, fields)
+    finally:
+        # Cached copies are dropped once the write is done (or failed), never before it lands
+        document_cache.invalidate(personal_info_ref(db, username))
+
+def with_pending_metrics(username, personal_info):
+    # Overlay personal-metric updates this worker accepted but hasn't written yet (read-your-writes)
+    if personal_info is not None:
+        personal_info.update(personal_metrics_writes.pending(username))
+    return personal_info
+
+def read_personal_info(username):
+    # The personal-info document from the shared read-through cache, or None when it doesn't exist;
+    # writes to it invalidate the cache
+    return with_pending_metrics(username, document_cache.get(personal_info_ref(db, username)))
+
+def read_profile(username):
+    # The users/{username} document from the shared read-through cache; the update routes invalidate it
+    return document_cache.get(db.collection('users').document(username))
+
+def update_profile_field(request_key, field):
+    # One write to users/{username} guarded by an exists precondition, instead of reading it first to check
+    try:
+        username = request.json.get('username')
+        value = request.json.get(request_key)
+        user_ref = db.collection('users').document(username)
+        try:
+            updated = update_existing(db, user_ref, {field: value})
+        finally:
+            # Dropped even when the write raised, since it may have landed anyway
+            document_cache.invalidate(user_ref)
+        if not updated:
+            # Document doesn't exist, return error response
+            return jsonify({"success": False, "message": "Document does not exist for user: " + username}), 404
+        return jsonify({"success": True}), 200
+    except Exception as e:
+        # Handle exceptions
+        return jsonify({"success": False, "message": str(e)}), 500
 
+def read_latest_glucose(username):
+    # Sweat and blood glucose of the newest reading, or None before the first one.
+    # Kept current by add_glucose_value, so a warm entry needs no Firestore read
+    latest = latest_glucose_cache.get(username)
+    if latest is None:
         # Reference to the Firestore document of the user
         user_ref = db.collection('users').document(username)
 
-        # Get pressure data collection for the user
-        pressure_data_ref = user_ref.collection('pressureData')
+        # Get glucose data collection for the user
+        glucose_data_ref = user_ref.collection('glucoseData')
 
-        print('Hello')
+        # Query glucose data collection for the most recent entry
+        latest_glucose_doc = glucose_data_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1).get()
+        if not latest_glucose_doc:
+            return None
+
+        latest = latest_glucose_reading(round(latest_glucose_doc[0].get('glucose'), 2), latest_glucose_doc[0].get('timestamp'))
+        latest_glucose_cache.put(username, latest, latest['timestamp'])
+    return latest
+
+def read_contacts(username):
+    # Query the contacts subcollection for the given user
+    contacts_ref = db.collection('users').document(username).collection('contacts')
+    contacts_query = contacts_ref.stream()
+
+    # Collect contact data from the documents
+    contacts = []
+    for contact_doc in contacts_query:
+        contact_info = contact_doc.to_dict()
+        contact_info['id'] = contact_doc.id  # Optionally include the document ID
+        contacts.append(contact_info)
+    return contacts
+
+def average_pressure_summary(region_stats):
+    if region_stats['count'] == 0:
+        average_pressure = 0
+        pressure_variance = 0
+    else:
+        # Round the average and variance to 2 decimal places
+        average_pressure = round(region_stats['mean'], 2)
+        pressure_variance = round(region_stats['variance'], 2)
+    diabetic_ulceration_risk = ulceration_risk(average_pressure, region_stats['count'])
+
+    return {"averagePressure": average_pressure, "pressureVariance": pressure_variance,
+            "sampleCount": region_stats['count'], "diabeticUlcerationRisk": diabetic_ulceration_risk}
+
+def ulceration_risk(average_pressure, sample_count):
+    # Average pressure above 200 kPa over the window puts a region at high risk
+    if sample_count == 0:
+        return 'Unknown'
+    if average_pressure <= 200:
+        return 'Low'
+    return 'High'
+
+def normalize_timestamp(timestamp_str):
+    # '2024-01-01T00:00' and '2024-01-01T00:00:00' are the same window
+    try:
+        return datetime.fromisoformat(timestamp_str).isoformat()
+    except (TypeError, ValueError):
+        return timestamp_str
 
-        # Query pressure data collection within the specified time range
-        pressure_data_docs = pressure_data_ref.where('timestamp', '>=', start_timestamp)\
-                                              .where('timestamp', '<=', end_timestamp)\
-                                              .order_by('timestamp', direction=firestore.Query.DESCENDING)\
-                                              .limit(50)\
-                                              .get()
-        
-        print('Bye')
+def fetch_pressure_data_internal(username, start_timestamp_str, end_timestamp_str, region):
+    try:
+        # Convert string timestamps to datetime objects
+        start_timestamp = datetime.fromisoformat(start_timestamp_str)
+        end_timestamp = datetime.fromisoformat(end_timestamp_str)
+
+        # Latest 50 samples in the range, from the in-memory buffer when it can answer, otherwise from
+        # whichever storage layout holds them
+        latest = pressure_ring_store.latest(username, start_timestamp, end_timestamp, 50,
+                                            load=lambda limit: read_latest_pressure_samples(db, username, limit))
+        if latest is not None:
+            timestamps, values = latest
+        else:
+            timestamps, values = read_pressure_samples(db, username, start_timestamp, end_timestamp, descending=True, limit=50)
+        region_values = values[:, CHANNELS.index(region)].tolist()
 
-        # Extract pressure data from the documents for the specified region
+        # Extract pressure data for the specified region
         pressure_data = []
-        for doc in pressure_data_docs:
+        for timestamp, value in zip(reversed(timestamps), reversed(region_values)):
             pressure_data.append({
-                region: doc.get(region),  # Only get the region specified
-                'timestamp': doc.get('timestamp')
+                region: value,  # Only get the region specified
+                'timestamp': timestamp
             })
 
         return pressure_data  # Return the data directly
@@ -1618,6 +1466,7 @@ def add_doctor(username, doctorName):
 
     # Update the user document to add the 'myDoctor' field
     user_ref.update({'myDoctor': doctorName})
+    document_cache.invalidate(user_ref)
 
 def initialize_user_thread_counter(username): # need to call at creation of each account
     # Reference to the user's thread counter document
@@ -1776,36 +1625,6 @@ def get_one_conversation(username, index):
     # Return None or an empty array if the document does not exist
     return None
 
-def predict_single_entry(input_data):
-    # Load the trained model and scaler objects
-    model_path = '544_trained_model.h5'
-    model = load_model(model_path)
-    scaler_x_path = '544_scaler_x.pkl'
-    scaler_y_path = '544_scaler_y.pkl'
-    scaler_x = joblib.load(scaler_x_path)
-    scaler_y = joblib.load(scaler_y_path)
-
-    # Ensure input_data is a DataFrame with the expected columns
-    if isinstance(input_data, pd.DataFrame) == False:
-        raise ValueError("Input data must be a pandas DataFrame.")
-    
-    # Ensure the DataFrame has the expected structure
-    expected_cols = ['glucose_level_value', 'finger_stick_value', 'basal_value', 'basis_gsr_value', 'basis_skin_temperature_value', 'bolus_dose']
-    if not all(col in input_data.columns for col in expected_cols):
-        raise ValueError("Input DataFrame does not contain the expected columns.")
-    
-    # Preprocess the input data
-    X_input = input_data.apply(pd.to_numeric, errors='coerce').fillna(0)
-    scaled_X_input = scaler_x.transform(X_input)
-    scaled_X_input = np.reshape(scaled_X_input, (1, scaled_X_input.shape[0], scaled_X_input.shape[1]))
-    
-    # Make prediction
-    prediction = model.predict(scaled_X_input, batch_size=1)
-    scaled_prediction = scaler_y.inverse_transform(prediction)
-    
-    return scaled_prediction.flatten()[0]  # Return a single predicted value
-
-
 def calculate_blood_glucose(sweat_glucose_umolL):
     BG_high = 300  # mg/dL
     BG_low = 50    # mg/dL
@@ -17,16 +17,17 @@ import time
 import statistics
 import pandas as pd
 import numpy as np
-from keras.models import load_model
-import joblib
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import pytz
-from matplotlib.figure import Figure
 import io
+from chart_data import prediction_chart_data, chart_data_json
+from plot_rendering import render_prediction_chart
+from chart_cache import image_cache, chart_cache, make_key, data_digest
+from downsampling import downsample_series, parse_max_points
+from pagination import parse_page, read_page, wants_page
+from model_registry import model_registry
+from training_data import training_data_store
+from glucose_inference import predict_single_entry, prediction_batcher, predict_rows, features_from_payload, flag_predictions, parse_threshold
 
 
 """
@@ -368,6 +369,9 @@ def add_pressure_value(username):
             'timestamp': firestore.SERVER_TIMESTAMP
         })
 
+        # Cached charts for this user no longer reflect their data
+        chart_cache.invalidate_user(username)
+
         return jsonify({"success": True, "message": "Pressure value added successfully"}), 200
 
     except Exception as e:
@@ -386,6 +390,14 @@ def get_pressure_data(username):
         start_timestamp = datetime.fromisoformat(start_timestamp_str)
         end_timestamp = datetime.fromisoformat(end_timestamp_str)
 
+        # Optional downsampling (max_points=1000&method=lttb|minmax, applied per page) and paging
+        # (page_size and/or cursor, the next_cursor of the previous response)
+        try:
+            max_points, method = parse_max_points(request.args)
+            page_size, cursor = parse_page(request.args) if wants_page(request.args) else (None, None)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
         # Reference to the Firestore document of the user
         user_ref = db.collection('users').document(username)
 
@@ -393,10 +405,14 @@ def get_pressure_data(username):
         pressure_data_ref = user_ref.collection('pressureData')
 
         # Query pressure data collection within the specified time range
-        pressure_data_docs = pressure_data_ref.where('timestamp', '>=', start_timestamp)\
-                                              .where('timestamp', '<=', end_timestamp)\
-                                              .order_by('timestamp')\
-                                              .get()
+        pressure_data_query = pressure_data_ref.where('timestamp', '>=', start_timestamp)\
+                                               .where('timestamp', '<=', end_timestamp)
+        next_cursor = None
+        if page_size is not None:
+            # One page at a time, continuing after the cursor from the previous page
+            pressure_data_docs, next_cursor = read_page(pressure_data_query, page_size, cursor)
+        else:
+            pressure_data_docs = pressure_data_query.order_by('timestamp').get()
 
         pressure_data = []
         for doc in pressure_data_docs:
@@ -404,8 +420,16 @@ def get_pressure_data(username):
                 'pressure': doc.get('pressure'),
                 'timestamp': doc.get('timestamp')
             })
+        total_points = len(pressure_data)
+
+        if max_points is not None and total_points > max_points:
+            # Readings that aren't numbers count as gaps when choosing points
+            pressure_values = pd.to_numeric(pd.Series([data['pressure'] for data in pressure_data], dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+            keep = downsample_series([data['timestamp'] for data in pressure_data], pressure_values, max_points, method)
+            pressure_data = [pressure_data[index] for index in keep]
 
-        return jsonify({"success": True, "pressureData": pressure_data}), 200
+        return jsonify({"success": True, "pressureData": pressure_data, "totalPoints": total_points,
+                        "downsampled": len(pressure_data) < total_points, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -430,6 +454,9 @@ def add_glucose_value(username):
             'timestamp': firestore.SERVER_TIMESTAMP
         })
 
+        # Cached charts for this user no longer reflect their data
+        chart_cache.invalidate_user(username)
+
         return jsonify({"success": True, "message": "Glucose value added successfully"}), 200
 
     except Exception as e:
@@ -448,6 +475,14 @@ def get_glucose_data(username):
         start_timestamp = datetime.fromisoformat(start_timestamp_str)
         end_timestamp = datetime.fromisoformat(end_timestamp_str)
 
+        # Optional downsampling (max_points=1000&method=lttb|minmax, applied per page) and paging
+        # (page_size and/or cursor, the next_cursor of the previous response)
+        try:
+            max_points, method = parse_max_points(request.args)
+            page_size, cursor = parse_page(request.args) if wants_page(request.args) else (None, None)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
         # Reference to the Firestore document of the user
         user_ref = db.collection('users').document(username)
 
@@ -455,10 +490,14 @@ def get_glucose_data(username):
         glucose_data_ref = user_ref.collection('glucoseData')
 
         # Query glucose data collection within the specified time range
-        glucose_data_docs = glucose_data_ref.where('timestamp', '>=', start_timestamp)\
-                                              .where('timestamp', '<=', end_timestamp)\
-                                              .order_by('timestamp')\
-                                              .get()
+        glucose_data_query = glucose_data_ref.where('timestamp', '>=', start_timestamp)\
+                                               .where('timestamp', '<=', end_timestamp)
+        next_cursor = None
+        if page_size is not None:
+            # One page at a time, continuing after the cursor from the previous page
+            glucose_data_docs, next_cursor = read_page(glucose_data_query, page_size, cursor)
+        else:
+            glucose_data_docs = glucose_data_query.order_by('timestamp').get()
 
         glucose_data = []
         for doc in glucose_data_docs:
@@ -466,8 +505,16 @@ def get_glucose_data(username):
                 'glucose': doc.get('glucose'),
                 'timestamp': doc.get('timestamp')
             })
+        total_points = len(glucose_data)
 
-        return jsonify({"success": True, "glucoseData": glucose_data}), 200
+        if max_points is not None and total_points > max_points:
+            # Readings that aren't numbers count as gaps when choosing points
+            glucose_values = pd.to_numeric(pd.Series([data['glucose'] for data in glucose_data], dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+            keep = downsample_series([data['timestamp'] for data in glucose_data], glucose_values, max_points, method)
+            glucose_data = [glucose_data[index] for index in keep]
+
+        return jsonify({"success": True, "glucoseData": glucose_data, "totalPoints": total_points,
+                        "downsampled": len(glucose_data) < total_points, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -513,18 +560,22 @@ def get_meals(username):
         start_timestamp = datetime.fromisoformat(start_timestamp_str)
         end_timestamp = datetime.fromisoformat(end_timestamp_str)
 
+        # Page through older meals with the next_cursor of the previous response
+        try:
+            page_size, cursor = parse_page(request.args, default_page_size=10)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
         # Reference to the Firestore document of the user
         user_ref = db.collection('users').document(username)
 
         # Get meals collection for the user
         meals_ref = user_ref.collection('meals')
 
-        # Query meals collection within the specified time range
-        meals_docs = meals_ref.where('timestamp', '>=', start_timestamp)\
-                              .where('timestamp', '<=', end_timestamp)\
-                              .order_by('timestamp', direction='DESCENDING')\
-                              .limit(10)\
-                              .get()
+        # Query meals collection within the specified time range, newest first, one page (10 meals by default) at a time
+        meals_query = meals_ref.where('timestamp', '>=', start_timestamp)\
+                               .where('timestamp', '<=', end_timestamp)
+        meals_docs, next_cursor = read_page(meals_query, page_size, cursor, direction='DESCENDING')
 
         meals_data = []
         for doc in meals_docs:
@@ -534,7 +585,7 @@ def get_meals(username):
                 'meal_description': doc.get('meal_description')
             })
 
-        return jsonify({"success": True, "mealsData": meals_data}), 200
+        return jsonify({"success": True, "mealsData": meals_data, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         # Handle exceptions
@@ -1263,112 +1314,116 @@ def plot_prediction_endpoint():
     hyperglycemia_threshold = request_data['hyperglycemia_threshold']
     hypoglycemia_threshold = request_data['hypoglycemia_threshold']
 
-    # Load training data
-    training_data = pd.read_csv('544-ws-training.csv')  # Adjust path as necessary
+    # Training data is parsed once per worker and cached as NumPy columns
+    training_data = training_data_store.get()
     
-    # Here, you would call your adapted plotting function with the loaded data
-    image_url = plot_prediction_with_training_and_predicted_data(
-        training_data,
-        input_data_df,
+    if request.args.get('format') == 'json':
+        # Data-only mode: the frontend draws the chart from the series, so nothing is rendered here
+        try:
+            layout = prediction_chart_layout(training_data, input_data_df, hyperglycemia_threshold, hypoglycemia_threshold)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        return jsonify({"success": True, "chart": chart_data_json(layout)})
+
+    # Identical inputs within the same minute (the x-axis labels are relative to now) render identically
+    cache_key = make_key(
+        'plot-prediction',
+        request_data['input_data'],
         hyperglycemia_threshold,
-        hypoglycemia_threshold
+        hypoglycemia_threshold,
+        data_digest(training_data['glucose_level_value'][-5:-1]),
+        datetime.now().strftime('%Y-%m-%dT%H:%M')
     )
+    png_bytes = chart_cache.get(cache_key)
+
+    if png_bytes is None:
+        # Here, you would call your adapted plotting function with the loaded data
+        try:
+            image_buffer = plot_prediction_with_training_and_predicted_data(
+                training_data,
+                input_data_df,
+                hyperglycemia_threshold,
+                hypoglycemia_threshold
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        png_bytes = image_buffer.getvalue()
+        chart_cache.put(cache_key, png_bytes)
+
+    # Each render is kept in memory under its content hash instead of a shared file on disk
+    digest = image_cache.put(png_bytes)
+
+    if request.args.get('format') == 'url':
+        # Old response shape: a URL the client fetches the image from
+        return jsonify({'image_url': url_for('get_plot_image', digest=digest, _external=True)})
+
+    return png_response(png_bytes, digest)
+
+@app.route('/plot-image/<digest>', methods=['GET'])
+def get_plot_image(digest):
+    # Serves a previously rendered chart by its content hash
+    png_bytes = image_cache.get(digest)
+    if png_bytes is None:
+        return jsonify({"success": False, "message": "Image not found"}), 404
+    return png_response(png_bytes, digest, immutable=True)
+
+@app.route('/model_status', methods=['GET'])
+def model_status():
+    # Reports which model version this worker has loaded, how long it took and its memory footprint
+    try:
+        if request.args.get('reload') == 'true':
+            model_registry.reload()
+        return jsonify({"success": True, "model": model_registry.stats(), "batching": prediction_batcher.stats(), "imageCache": image_cache.stats(), "chartCache": chart_cache.stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    # Scores many feature rows in one vectorized scaler and model pass, e.g. to backfill historical data
+    try:
+        request_data = request.json
+        try:
+            X_input = features_from_payload(request_data)
+            hyperglycemia_threshold = parse_threshold(request_data, 'hyperglycemia_threshold')
+            hypoglycemia_threshold = parse_threshold(request_data, 'hypoglycemia_threshold')
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
 
-    # Return the URL to the saved image
-    return jsonify({'image_url': image_url})
+        predictions = predict_rows(X_input.to_numpy()) if len(X_input) else np.array([])
+        flags = flag_predictions(predictions, hyperglycemia_threshold, hypoglycemia_threshold)
+
+        return jsonify({"success": True, "count": len(predictions), "predictions": predictions.tolist(), **flags}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
 
 """Helper Methods"""
 
 
 def plot_prediction_with_training_and_predicted_data(training_data, input_data, hyperglecemia_threshold, hypoglycemia_threshold):
-    plt.figure(figsize=(12, 7), facecolor='#1b2130')
-    ax = plt.axes()
-    ax.set_facecolor('#1b2130')
+    layout = prediction_chart_layout(training_data, input_data, hyperglecemia_threshold, hypoglycemia_threshold)
 
-    # Use 'America/Edmonton' for Alberta, Canada
-    utc_minus_6 = pytz.timezone('America/Edmonton')
-    current_time = datetime.now().astimezone(utc_minus_6)
-
-    # Create timestamps from 5 hours in the past to 1 hour in the future
-    timestamps = [current_time - timedelta(hours=10-x) for x in range(6)]  # Adjusting to include 6 timestamps
+    # Rendered on a pooled Figure template rather than the global pyplot state
+    return render_prediction_chart(layout)
 
+def prediction_chart_layout(training_data, input_data, hyperglecemia_threshold, hypoglycemia_threshold):
     # Adjusted to take the 2nd last to the 5th last values from training_data
-    glucose_levels = np.concatenate([training_data['glucose_level_value'].iloc[-5:-1].values, input_data['glucose_level_value'].head(1).values])
+    glucose_levels = np.concatenate([training_data['glucose_level_value'][-5:-1], input_data['glucose_level_value'].head(1).values])
 
     # Get predicted value
-    last_row = training_data.iloc[-1:][['glucose_level_value', 'finger_stick_value', 'basal_value', 'basis_gsr_value', 'basis_skin_temperature_value', 'bolus_dose']]
     predicted_value = predict_single_entry(input_data)
 
-    # Plot training data
-    plt.plot(timestamps[:-1], glucose_levels, label='Insole Recorded Data', color='#007bff', marker='o', markersize=12, linewidth=3, markeredgewidth=2, markeredgecolor='white')
-    plt.fill_between(timestamps[:-1], glucose_levels, y2=glucose_levels.min(), color='#007bff', alpha=0.075) # underglow effect for training data
+    return prediction_chart_data(glucose_levels, predicted_value, hyperglecemia_threshold, hypoglycemia_threshold)
 
-    if predicted_value<=hypoglycemia_threshold or predicted_value>=hyperglecemia_threshold:
-      fill_color = '#ff0000'
+def png_response(png_bytes, digest, immutable=False):
+    # PNG bytes with a content-hash ETag; a GET with a matching If-None-Match gets an empty 304
+    response = Response(png_bytes, mimetype='image/png')
+    response.set_etag(digest)
+    if immutable:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
     else:
-      fill_color = '#7CFC00'
-
-    # Add predicted value as the future point
-    predicted_time = timestamps[-1]
-    plt.scatter(predicted_time, predicted_value, color=fill_color, label='Predicted Value', zorder=5, s=250, edgecolor='white', linewidth=2)
-    plt.plot([timestamps[-2], predicted_time], [glucose_levels[-1], predicted_value], color=fill_color, linestyle='--', linewidth=3)
-
-    # Add underglow effect for predicted value
-    plt.fill_between([timestamps[-2], predicted_time], [glucose_levels[-1], predicted_value], y2=glucose_levels.min(), color=fill_color, alpha=0.075) # underglow effect for predicted value
-
-    # Adjust x-axis to properly show all timestamps
-    plt.xlim([timestamps[0]- timedelta(seconds=240), predicted_time + timedelta(minutes=30)])
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%I:%M %p'))  # Updated time format
-    plt.xticks(rotation=45, color='white', fontsize=16)
-    plt.yticks(color='white', fontsize=16)
-
-    # Adjust y-axis limits
-    plt.ylim(glucose_levels.min()-2, max(glucose_levels) + 10)
-
-    # Labeling and styling
-    plt.xlabel('Time (Hourly)', color='white', fontsize=20, labelpad=20, fontweight='600')
-    plt.ylabel('Glucose Level (mg/dL)', color='white', fontsize=20, labelpad=20, fontweight='550')
-    # After your plot and legend setup
-    legend = plt.legend(facecolor='#1b2130', edgecolor='white', fontsize=16, loc='upper left')
-    # Set the color of all the legend text to white
-    plt.setp(legend.get_texts(), color='white')
-
-    # Add vertical dotted line across the last training data point
-    plt.axvline(x=timestamps[-2], color='white', linestyle='--', linewidth=1.5, alpha=0.8)
-
-    # Add small black box along the line with white text for "Now"
-    bbox_props_now = dict(boxstyle="round,pad=0.3", fc="black", ec="none", alpha=0.8)
-    current_glucose_value = glucose_levels[-1]  # The current (most recent) glucose level
-    text_now = f"Now\n{current_glucose_value:.1f} mg/dL"  # Glucose level on the next line, without colon
-    plt.text(timestamps[-2], current_glucose_value + 4, text_now, color='white', fontsize=15, ha='center', va='center', bbox=bbox_props_now, linespacing=1.5)
-
-
-    # Add small black box along the line with white text for "Future"
-    bbox_props_future = dict(boxstyle="round,pad=0.3", fc="black", ec="none", alpha=0.8)
-    predicted_glucose_value = predicted_value  # The future predicted glucose level
-    text_future = f"Prediction\n{predicted_glucose_value:.1f} mg/dL"  # Glucose level on the next line, without colon
-    plt.text(predicted_time, predicted_glucose_value + 4, text_future, color='white', fontsize=15, ha='center', va='center', bbox=bbox_props_future, linespacing=1.5)
-
-    # Remove the top and right spines
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_color('white')
-
-
-    plt.grid(color='gray', linestyle='--', linewidth=0.5)
-    plt.tight_layout()
-    
-    # Define the image save path
-    image_save_path = 'glucose_plot.png'
-    plt.savefig(image_save_path)
-    plt.close()
-
-    # Construct the URL to access the saved image
-    # Adjust the URL based on your actual server setup and image serving mechanism
-    image_url = f'https://i-sole-backend.com/{image_save_path}'
-
-    return image_url
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 def add_doctor(username, doctorName):
     # Reference to the Firestore document of the user
@@ -1534,34 +1589,5 @@ def get_one_conversation(username, index):
     # Return None or an empty array if the document does not exist
     return None
 
-def predict_single_entry(input_data):
-    # Load the trained model and scaler objects
-    model_path = '544_trained_model.h5'
-    model = load_model(model_path)
-    scaler_x_path = '544_scaler_x.pkl'
-    scaler_y_path = '544_scaler_y.pkl'
-    scaler_x = joblib.load(scaler_x_path)
-    scaler_y = joblib.load(scaler_y_path)
-
-    # Ensure input_data is a DataFrame with the expected columns
-    if isinstance(input_data, pd.DataFrame) == False:
-        raise ValueError("Input data must be a pandas DataFrame.")
-    
-    # Ensure the DataFrame has the expected structure
-    expected_cols = ['glucose_level_value', 'finger_stick_value', 'basal_value', 'basis_gsr_value', 'basis_skin_temperature_value', 'bolus_dose']
-    if not all(col in input_data.columns for col in expected_cols):
-        raise ValueError("Input DataFrame does not contain the expected columns.")
-    
-    # Preprocess the input data
-    X_input = input_data.apply(pd.to_numeric, errors='coerce').fillna(0)
-    scaled_X_input = scaler_x.transform(X_input)
-    scaled_X_input = np.reshape(scaled_X_input, (1, scaled_X_input.shape[0], scaled_X_input.shape[1]))
-    
-    # Make prediction
-    prediction = model.predict(scaled_X_input, batch_size=1)
-    scaled_prediction = scaler_y.inverse_transform(prediction)
-    
-    return scaled_prediction.flatten()[0]  # Return a single predicted value
-
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Caches for rendered chart PNGs.
+
+ImageCache is content-addressed: a PNG is stored under the SHA-256 of its
+bytes, which doubles as its ETag and as the id in /plot-image/<digest> URLs.
+Entries are evicted least-recently-used first once the total size passes the
+byte budget.
+
+RenderedChartCache maps normalized request inputs to the PNG they produced, so
+dashboards polling a plot endpoint with identical parameters skip both the
+Firestore query and the render. Entries expire after a TTL, and everything
+cached for a user is dropped when new pressure or glucose data is written for
+them.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _normalize(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return str(value)
+
+
+def make_key(*parts):
+    # Stable across dict ordering and int/float spelling of the same number
+    normalized = json.dumps(_normalize(parts), sort_keys=True)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def data_digest(values):
+    return hashlib.sha256(np.asarray(values, dtype=np.float64).tobytes()).hexdigest()
+
+
+class ImageCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, data):
+        digest = content_digest(data)
+        if len(data) > self.max_bytes:
+            # Too big to ever fit; still hand back the digest for the ETag
+            return digest
+
+        with self._lock:
+            if digest in self._images:
+                self._images.move_to_end(digest)
+                return digest
+            self._images[digest] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+        return digest
+
+    def get(self, digest):
+        with self._lock:
+            data = self._images.get(digest)
+            if data is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(digest)
+            self.hits += 1
+            return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._images),
+                'bytes': self._size,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class RenderedChartCache:
+    def __init__(self, max_entries=256, ttl_seconds=30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, username, png bytes)
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, key):
+        _, username, _ = self._entries.pop(key)
+        if username is not None:
+            user_keys = self._keys_by_user.get(username)
+            if user_keys is not None:
+                user_keys.discard(key)
+                if not user_keys:
+                    del self._keys_by_user[username]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, png_bytes, username=None):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, username, png_bytes)
+            if username is not None:
+                self._keys_by_user.setdefault(username, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, username):
+        # Called whenever pressureData or glucoseData is written for this user
+        with self._lock:
+            for key in list(self._keys_by_user.get(username, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+image_cache = ImageCache(int(float(os.environ.get('PLOT_IMAGE_CACHE_MB', 32)) * 1024 * 1024))
+chart_cache = RenderedChartCache(
+    max_entries=int(os.environ.get('PLOT_CACHE_MAX_ENTRIES', 256)),
+    ttl_seconds=float(os.environ.get('PLOT_CACHE_TTL_SECONDS', 30)),
+)
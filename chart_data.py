@@ -0,0 +1,116 @@
+"""
+Chart layouts for the dashboard plots, without matplotlib.
+
+Each function works out everything a chart shows: the series, the prediction
+point and its alert colour, thresholds, axis bounds and annotation positions.
+plot_rendering.py draws exactly these layouts into PNGs, and the plot
+endpoints can return them as JSON (?format=json) so the frontend draws the
+chart itself.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+
+DATA_COLOR = '#007bff'
+ALERT_COLOR = '#ff0000'
+NORMAL_COLOR = '#7CFC00'
+
+PRESSURE_POINTS = 50
+PRESSURE_INTERVAL_SECONDS = 5
+
+
+def _nonsingular(vmin, vmax, expander=0.05):
+    # Same widening matplotlib applies when both limits are equal
+    if vmax - vmin > 1e-15 * max(abs(vmin), abs(vmax)):
+        return vmin, vmax
+    if vmax == 0 and vmin == 0:
+        return -expander, expander
+    return vmin - expander * abs(vmin), vmax + expander * abs(vmax)
+
+
+def _margin_bounds(vmin, vmax, margin=0.05):
+    return vmin - margin * (vmax - vmin), vmax + margin * (vmax - vmin)
+
+
+def pressure_chart_data(values):
+    """
+    Layout for up to 50 pressure readings plotted 5 seconds apart.
+    """
+    values = [float(value) for value in values][:PRESSURE_POINTS]
+    ticks = [x * PRESSURE_INTERVAL_SECONDS for x in range(PRESSURE_POINTS)]
+    x = ticks[:len(values)]
+
+    # Data bounds with matplotlib's default 5% margin, widened to show every tick
+    if values:
+        x_min, x_max = _margin_bounds(x[0], x[-1])
+        x_min, x_max = min(x_min, ticks[0]), max(x_max, ticks[-1])
+    else:
+        x_min, x_max = ticks[0], ticks[-1]
+
+    if values:
+        y_min, y_max = min(values), max(values)
+        y_range = y_max - y_min
+        y_bounds = {'min': y_min - 0.05 * y_range, 'max': y_max + 0.3 * y_range}
+        y_bounds['min'], y_bounds['max'] = _nonsingular(y_bounds['min'], y_bounds['max'])
+    else:
+        y_bounds = None
+
+    return {
+        'series': {'label': 'Insole Recorded Data', 'color': DATA_COLOR, 'x': x, 'y': values},
+        'xTicks': ticks,
+        'xAxis': {'min': x_min, 'max': x_max, 'label': 'Time (seconds)'},
+        'yAxis': dict(y_bounds or {}, label='Pressure Value (kPa)'),
+    }
+
+
+def prediction_chart_data(glucose_levels, predicted_value, hyperglycemia_threshold, hypoglycemia_threshold, current_time=None):
+    """
+    Layout for the last five glucose readings (hourly, ending now) and the
+    predicted value an hour ahead.
+    """
+    if current_time is None:
+        # Use 'America/Edmonton' for Alberta, Canada
+        current_time = datetime.now().astimezone(pytz.timezone('America/Edmonton'))
+
+    glucose_levels = [float(value) for value in glucose_levels]
+    predicted_value = float(predicted_value)
+
+    # Create timestamps from 10 hours in the past, one per hour, the last being the prediction
+    timestamps = [current_time - timedelta(hours=10 - x) for x in range(6)]
+    predicted_time = timestamps[-1]
+
+    alert = predicted_value <= hypoglycemia_threshold or predicted_value >= hyperglycemia_threshold
+    fill_color = ALERT_COLOR if alert else NORMAL_COLOR
+    current_glucose_value = glucose_levels[-1]
+    baseline = min(glucose_levels)
+
+    return {
+        'series': {'label': 'Insole Recorded Data', 'color': DATA_COLOR, 'x': timestamps[:-1], 'y': glucose_levels},
+        'prediction': {'label': 'Predicted Value', 'x': predicted_time, 'y': predicted_value, 'color': fill_color, 'alert': alert},
+        'predictionSegment': {'x': [timestamps[-2], predicted_time], 'y': [current_glucose_value, predicted_value]},
+        'underglowBaseline': baseline,
+        'thresholds': {'hyperglycemia': hyperglycemia_threshold, 'hypoglycemia': hypoglycemia_threshold},
+        'nowLine': {'x': timestamps[-2]},
+        'xAxis': {'min': timestamps[0] - timedelta(seconds=240), 'max': predicted_time + timedelta(minutes=30), 'label': 'Time (Hourly)'},
+        'yAxis': {'min': baseline - 2, 'max': max(glucose_levels) + 10, 'label': 'Glucose Level (mg/dL)'},
+        'annotations': [
+            {'x': timestamps[-2], 'y': current_glucose_value + 4, 'text': f"Now\n{current_glucose_value:.1f} mg/dL"},
+            {'x': predicted_time, 'y': predicted_value + 4, 'text': f"Prediction\n{predicted_value:.1f} mg/dL"},
+        ],
+    }
+
+
+def chart_data_json(layout):
+    # Timestamps as ISO 8601 with their UTC offset; numpy scalars as plain numbers
+    if isinstance(layout, dict):
+        return {key: chart_data_json(value) for key, value in layout.items()}
+    if isinstance(layout, (list, tuple)):
+        return [chart_data_json(value) for value in layout]
+    if isinstance(layout, datetime):
+        return layout.isoformat()
+    if isinstance(layout, np.generic):
+        return layout.item()
+    return layout
@@ -0,0 +1,165 @@
+"""
+Read-through cache of single Firestore documents, keyed by document path.
+
+Dashboards read users/{username} and its personal-info document from many
+endpoints per page load. get() answers from memory while an entry is fresh;
+otherwise one request reads the document and concurrent requests for the same
+path wait for that read instead of issuing their own. Missing documents are
+cached as None.
+
+Every route that writes one of these documents calls invalidate() after the
+write. A read that was in flight when the document was invalidated isn't
+cached, so it can't put the old contents back. Entries expire after
+DOCUMENT_CACHE_TTL_SECONDS, which bounds staleness from writes made by other
+workers; set it to 0 to turn the cache off.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class DocumentCache:
+    def __init__(self, ttl_seconds=30.0, max_entries=4096):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # path -> (expires_at, document dict or None)
+        self._entries = OrderedDict()
+        # path -> Event set when the read in flight finishes
+        self._loading = {}
+        # Paths invalidated while a read was in flight
+        self._stale = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def _put(self, path, data):
+        self._entries[path] = (time.monotonic() + self.ttl_seconds, data)
+        self._entries.move_to_end(path)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, ref):
+        """
+        The document at `ref` as a dict, or None when it doesn't exist. The
+        dict is a copy the caller may change.
+        """
+        if not self.enabled:
+            snapshot = ref.get()
+            return snapshot.to_dict() if snapshot.exists else None
+
+        path = ref.path
+        while True:
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry[0] >= time.monotonic():
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return dict(entry[1]) if entry[1] is not None else None
+                if entry is not None:
+                    del self._entries[path]
+                loading = self._loading.get(path)
+                if loading is None:
+                    loading = self._loading[path] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another request is already reading this document
+            loading.wait()
+
+        try:
+            snapshot = ref.get()
+            data = snapshot.to_dict() if snapshot.exists else None
+            with self._lock:
+                if path in self._stale:
+                    self._stale.discard(path)
+                else:
+                    self._put(path, data)
+        finally:
+            with self._lock:
+                del self._loading[path]
+                self._stale.discard(path)
+            loading.set()
+        return dict(data) if data is not None else None
+
+    def get_all(self, db, refs):
+        """
+        The documents at `refs`, in order, as get() would return them. Every
+        document not already cached is read in one db.get_all() round trip.
+        """
+        if not self.enabled:
+            by_path = {snapshot.reference.path: snapshot.to_dict() if snapshot.exists else None for snapshot in db.get_all(refs)}
+            return [by_path.get(ref.path) for ref in refs]
+
+        results = {}
+        to_read = []
+        waiting = []
+        with self._lock:
+            for ref in refs:
+                path = ref.path
+                entry = self._entries.get(path)
+                if entry is not None and entry[0] >= time.monotonic():
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    results[path] = entry[1]
+                elif path in self._loading:
+                    waiting.append(ref)
+                else:
+                    self._loading[path] = threading.Event()
+                    self.misses += 1
+                    to_read.append(ref)
+
+        if to_read:
+            try:
+                # get_all returns snapshots in no particular order
+                for snapshot in db.get_all(to_read):
+                    results[snapshot.reference.path] = snapshot.to_dict() if snapshot.exists else None
+                with self._lock:
+                    for ref in to_read:
+                        if ref.path in self._stale:
+                            self._stale.discard(ref.path)
+                        else:
+                            self._put(ref.path, results.get(ref.path))
+            finally:
+                with self._lock:
+                    events = [self._loading.pop(ref.path) for ref in to_read]
+                    for ref in to_read:
+                        self._stale.discard(ref.path)
+                for event in events:
+                    event.set()
+
+        # Documents another request was already reading
+        for ref in waiting:
+            results[ref.path] = self.get(ref)
+
+        return [dict(results[ref.path]) if results.get(ref.path) is not None else None for ref in refs]
+
+    def invalidate(self, ref):
+        with self._lock:
+            self._entries.pop(ref.path, None)
+            if ref.path in self._loading:
+                self._stale.add(ref.path)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+
+document_cache = DocumentCache(
+    ttl_seconds=float(os.environ.get('DOCUMENT_CACHE_TTL_SECONDS', 30)),
+    max_entries=int(os.environ.get('DOCUMENT_CACHE_MAX_ENTRIES', 4096)),
+)
@@ -0,0 +1,22 @@
+"""
+Updates that only apply to documents that already exist.
+
+update_existing sends one update() carrying an exists=True precondition, so
+the server rejects a write to a missing document and no read is needed to
+check for it first. Callers turn the False it returns into their 404.
+"""
+
+
+def update_existing(db, ref, fields):
+    """
+    Write `fields` into the document at `ref` if it exists. Returns False
+    when it doesn't.
+    """
+    # Imported here so callers stay importable without the Firebase SDK
+    from google.api_core.exceptions import NotFound
+
+    try:
+        ref.update(fields, option=db.write_option(exists=True))
+    except NotFound:
+        return False
+    return True
@@ -0,0 +1,134 @@
+"""
+Downsampling for long time series before they are sent to a chart.
+
+Both methods return the sorted indexes of the points to keep, so callers can
+pick the matching rows (timestamps, documents, ...) out of whatever they
+loaded. y may have several columns, e.g. the six pressure regions, in which
+case one set of points is chosen for all of them.
+
+  lttb     Largest-Triangle-Three-Buckets: keeps the first and last point and,
+           from each bucket in between, the point forming the largest triangle
+           with the point kept before it and the average of the next bucket.
+           Best at preserving the visual shape of a line.
+  minmax   Keeps the minimum and maximum of every column in each bucket, so
+           no peak is ever dropped.
+"""
+
+import numpy as np
+
+
+METHODS = ['lttb', 'minmax']
+
+# LTTB needs the two end points plus at least one bucket
+MIN_POINTS = 3
+
+
+def _as_columns(y):
+    y = np.asarray(y, dtype=np.float64)
+    y = y.reshape(len(y), -1)
+    # Scale every column to [0, 1] so one region or unit can't dominate the triangle areas, and treat gaps as 0
+    low, high = np.nanmin(y, axis=0, initial=np.inf), np.nanmax(y, axis=0, initial=-np.inf)
+    span = np.where(high > low, high - low, 1.0)
+    return np.nan_to_num((y - np.where(np.isfinite(low), low, 0)) / span)
+
+
+def lttb_indexes(x, y, max_points):
+    """
+    Indexes of at most max_points points chosen by Largest-Triangle-Three-Buckets.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if max_points >= n or n <= MIN_POINTS:
+        return np.arange(n)
+    max_points = max(max_points, MIN_POINTS)
+    y = _as_columns(y)
+
+    # n - 2 interior points split into max_points - 2 buckets
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the following bucket, or the last point for the final bucket
+        if bucket + 2 < len(edges):
+            next_x = x[end:edges[bucket + 2]].mean()
+            next_y = y[end:edges[bucket + 2]].mean(axis=0)
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        ax, ay = x[previous], y[previous]
+        areas = np.abs((ax - next_x) * (y[start:end] - ay) - (ax - x[start:end, np.newaxis]) * (next_y - ay)).sum(axis=1)
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def minmax_indexes(x, y, max_points):
+    """
+    Indexes of the first and last point plus the minimum and maximum of every
+    column per bucket, at most max_points in total.
+    """
+    n = len(x)
+    if max_points >= n or n <= MIN_POINTS:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    y = y.reshape(n, -1)
+    columns = y.shape[1]
+    if max_points - 2 < 2 * columns:
+        # Not even one bucket's worth of minima and maxima fits
+        return lttb_indexes(x, y, max_points)
+
+    buckets = (max_points - 2) // (2 * columns)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    selected = {0, n - 1}
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        # All-NaN columns fall back to the bucket's first point
+        chunk = y[start:end]
+        lows = np.where(np.isnan(chunk), np.inf, chunk).argmin(axis=0)
+        highs = np.where(np.isnan(chunk), -np.inf, chunk).argmax(axis=0)
+        selected.update((start + lows).tolist())
+        selected.update((start + highs).tolist())
+
+    return np.array(sorted(selected), dtype=np.int64)
+
+
+def downsample_indexes(x, y, max_points, method='lttb'):
+    if method == 'lttb':
+        return lttb_indexes(x, y, max_points)
+    if method == 'minmax':
+        return minmax_indexes(x, y, max_points)
+    raise ValueError(f"unknown downsampling method '{method}'; expected one of {', '.join(METHODS)}")
+
+
+def downsample_series(timestamps, values, max_points, method='lttb'):
+    """
+    Indexes to keep from a series of datetimes and their values (one value,
+    or one row of values, per timestamp).
+    """
+    x = np.array([timestamp.timestamp() for timestamp in timestamps], dtype=np.float64)
+    return downsample_indexes(x, values, max_points, method)
+
+
+def parse_max_points(args):
+    """
+    Read max_points and method from request query parameters. Returns
+    (max_points or None, method); raises ValueError for bad values.
+    """
+    method = args.get('method', 'lttb')
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    max_points = args.get('max_points')
+    if max_points is None:
+        return None, method
+    try:
+        max_points = int(max_points)
+    except ValueError:
+        raise ValueError("max_points must be an integer")
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    return max_points, method
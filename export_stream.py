@@ -0,0 +1,88 @@
+"""
+Generators that turn records into a streamed download.
+
+Records are dicts that are written out one at a time as newline-delimited
+JSON or CSV, grouped into chunks of roughly CHUNK_BYTES for chunked transfer,
+and optionally gzip-compressed on the fly. Nothing holds more than one chunk,
+so an export of any length runs in constant memory.
+"""
+
+import csv
+import io
+import json
+import math
+import zlib
+
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CHUNK_BYTES = 64 * 1024
+
+
+def _json_value(value):
+    # Timestamps as ISO 8601, NaN (a missing reading) as null
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps({key: _json_value(value) for key, value in record.items()}, separators=(',', ':')) + '\n'
+
+
+def csv_lines(records, fields):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    for record in records:
+        writer.writerow(['' if _json_value(record.get(field)) is None else _json_value(record.get(field)) for field in fields])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    # The header on its own when there are no records
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def chunked(lines, chunk_bytes=CHUNK_BYTES):
+    """
+    Group lines into byte chunks of about chunk_bytes.
+    """
+    parts = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            yield b''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield b''.join(parts)
+
+
+def gzipped(chunks):
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(records, export_format, fields, gzip=False):
+    """
+    Byte chunks of the records in 'ndjson' or 'csv' format.
+    """
+    if export_format == 'csv':
+        lines = csv_lines(records, fields)
+    elif export_format == 'ndjson':
+        lines = ndjson_lines(records)
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    chunks = chunked(lines)
+    return gzipped(chunks) if gzip else chunks
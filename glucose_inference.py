@@ -0,0 +1,113 @@
+"""
+Shared glucose prediction path for both app variants.
+
+predict_rows() is the vectorized core: it scales an (N, 6) feature matrix, runs
+one model pass with a sequence length of 1 per row, and inverse-scales the
+output. Single-row callers go through the micro-batcher so that concurrent
+/plot-prediction requests share a model pass.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from inference_batcher import MicroBatcher
+from model_registry import model_registry
+
+
+EXPECTED_COLS = ['glucose_level_value', 'finger_stick_value', 'basal_value', 'basis_gsr_value', 'basis_skin_temperature_value', 'bolus_dose']
+
+
+def prepare_features(input_data):
+    # Ensure input_data is a DataFrame with the expected columns
+    if isinstance(input_data, pd.DataFrame) == False:
+        raise ValueError("Input data must be a pandas DataFrame.")
+
+    # Ensure the DataFrame has the expected structure
+    if not all(col in input_data.columns for col in EXPECTED_COLS):
+        raise ValueError("Input DataFrame does not contain the expected columns.")
+
+    # Non-numeric values are treated as missing readings
+    return input_data[EXPECTED_COLS].apply(pd.to_numeric, errors='coerce').fillna(0)
+
+
+def predict_rows(X_input):
+    handle = model_registry.get()
+    X_input = pd.DataFrame(np.asarray(X_input, dtype=np.float64).reshape(-1, len(EXPECTED_COLS)), columns=EXPECTED_COLS)
+
+    scaled_X_input = handle.scaler_x.transform(X_input)
+    # The model was trained on sequences of length 1: (rows, 1, features)
+    scaled_X_input = np.reshape(scaled_X_input, (scaled_X_input.shape[0], 1, scaled_X_input.shape[1]))
+
+    prediction = handle.predict(scaled_X_input, batch_size=scaled_X_input.shape[0])
+    return handle.scaler_y.inverse_transform(prediction).flatten()
+
+
+prediction_batcher = MicroBatcher(
+    predict_rows,
+    max_batch_size=int(os.environ.get('PREDICT_MAX_BATCH_SIZE', 64)),
+    max_wait_ms=float(os.environ.get('PREDICT_BATCH_WINDOW_MS', 5)),
+)
+
+
+def predict_single_entry(input_data):
+    X_input = prepare_features(input_data)
+    if len(X_input) != 1:
+        # Several rows are scored with predict_rows (/predict/batch), not silently cut down to the first
+        raise ValueError(f"Expected exactly one input row, got {len(X_input)}.")
+    return prediction_batcher.submit(X_input.to_numpy()[0])
+
+
+MAX_BATCH_ROWS = int(os.environ.get('PREDICT_MAX_BATCH_ROWS', 50000))
+
+
+def features_from_payload(payload):
+    """
+    Build the feature DataFrame for /predict/batch from either a row list
+    ({"rows": [{...}, ...]}) or a columnar payload ({"columns": {"glucose_level_value": [...], ...}}).
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Payload must be a JSON object.")
+    if 'rows' in payload:
+        rows = payload['rows']
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("'rows' must be a list of objects.")
+        input_data = pd.DataFrame(rows)
+    elif 'columns' in payload:
+        columns = payload['columns']
+        if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+            raise ValueError("'columns' must be an object of value lists.")
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same number of values.")
+        input_data = pd.DataFrame(columns)
+    else:
+        raise ValueError("Payload must contain either 'rows' or 'columns'.")
+
+    if len(input_data) > MAX_BATCH_ROWS:
+        raise ValueError(f"At most {MAX_BATCH_ROWS} rows can be scored per request.")
+    return prepare_features(input_data)
+
+
+def parse_threshold(payload, name):
+    # A threshold may arrive as a JSON number or a numeric string; anything else is the client's error
+    value = payload.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number.")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number.")
+
+
+def flag_predictions(predictions, hyperglycemia_threshold=None, hypoglycemia_threshold=None):
+    # Same comparison plot_prediction uses to colour the predicted point red
+    flags = {}
+    if hypoglycemia_threshold is not None:
+        flags['hypoglycemia'] = (predictions <= hypoglycemia_threshold).tolist()
+    if hyperglycemia_threshold is not None:
+        flags['hyperglycemia'] = (predictions >= hyperglycemia_threshold).tolist()
+    return flags
@@ -0,0 +1,109 @@
+"""
+Micro-batching front end for the glucose model.
+
+Concurrent requests each hand over a single feature row. A background thread
+collects rows for a few milliseconds (or until the batch is full), runs one
+vectorized predict over all of them and hands every caller back its own value.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class _PendingPrediction:
+    def __init__(self, row):
+        self.row = row
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5.0):
+        # predict_fn takes an (N, features) array and returns N predictions
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+
+    def _ensure_started(self):
+        # Threads don't survive a fork, so a worker forked after the batcher
+        # started (e.g. gunicorn --preload) has to start its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='glucose-micro-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, row, timeout=30.0):
+        """
+        Queue one feature row and block until its prediction is ready.
+        """
+        self._ensure_started()
+        pending = _PendingPrediction(np.asarray(row, dtype=np.float64).reshape(1, -1))
+        self._queue.put(pending)
+
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for a batched prediction")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        # Block for the first row, then keep collecting until the window closes or the batch is full
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                predictions = np.asarray(self.predict_fn(np.vstack([pending.row for pending in batch]))).reshape(-1)
+                for pending, prediction in zip(batch, predictions):
+                    pending.result = prediction
+            except Exception as e:
+                # Every caller in the batch sees the failure instead of hanging until its timeout
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'averageBatchSize': round(self.requests / self.batches, 2) if self.batches else 0,
+            'largestBatch': self.largest_batch,
+            'maxBatchSize': self.max_batch_size,
+            'windowMs': self.max_wait_seconds * 1000.0,
+        }
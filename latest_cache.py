@@ -0,0 +1,85 @@
+"""
+Write-through cache of each user's latest reading.
+
+The ingest route puts every new value here as it writes it to Firestore, so
+the frequently polled "latest" endpoints are answered from memory. An entry
+is replaced only by a reading at least as new as the one it holds, so a slow
+Firestore fallback read can't overwrite a value that was ingested meanwhile.
+
+Entries expire after a TTL, after which the next read goes back to Firestore:
+that bounds how stale a worker can be when the write landed on another
+worker. The least recently used users are dropped past max_users.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LatestValueCache:
+    def __init__(self, ttl_seconds=300.0, max_users=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        # username -> (expires_at, timestamp, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_users > 0
+
+    def get(self, username):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, username, value, timestamp):
+        """
+        Cache `value` as the user's latest, read or written at `timestamp`
+        (timezone-aware). Returns False when a newer value is already held.
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] >= time.monotonic() and entry[1] > timestamp:
+                return False
+            self._entries[username] = (time.monotonic() + self.ttl_seconds, timestamp, value)
+            self._entries.move_to_end(username)
+            self.writes += 1
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._entries),
+                'maxUsers': self.max_users,
+                'ttlSeconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+            }
+
+
+latest_glucose_cache = LatestValueCache(
+    ttl_seconds=float(os.environ.get('LATEST_GLUCOSE_TTL_SECONDS', 300)),
+    max_users=int(os.environ.get('LATEST_GLUCOSE_USERS', 1024)),
+)
@@ -0,0 +1,181 @@
+"""
+Server-Sent Events fan-out for live dashboards.
+
+Each open /events/<username> stream is a subscriber with its own bounded
+queue. An ingest request publishes one event per user: it is serialized once
+and offered to every subscriber without blocking, so a slow client can never
+hold up an upload or the other clients.
+
+Backpressure: when a subscriber's queue is full its oldest event is dropped
+to make room. A subscriber that has fallen a whole queue behind since it last
+read is disconnected with a 'reset' event, telling the client to reload its
+state over the REST endpoints before reconnecting. Idle streams get a comment
+every LIVE_HEARTBEAT_SECONDS, which keeps proxies from closing them and lets
+the server notice clients that went away.
+
+Like the pressure ring buffers, subscribers only see data ingested by this
+process.
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+
+LIVE_QUEUE_SIZE = int(os.environ.get('LIVE_QUEUE_SIZE', 64))
+LIVE_MAX_SUBSCRIBERS = int(os.environ.get('LIVE_MAX_SUBSCRIBERS', 8))
+LIVE_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_HEARTBEAT_SECONDS', 15))
+
+# Clients wait this long before reconnecting after the stream drops
+RETRY_MILLISECONDS = 3000
+
+_RESET = object()
+
+
+def format_event(event_id, event, data):
+    # One SSE message; the JSON is compact so it always fits on a single data line
+    payload = json.dumps(data, separators=(',', ':'), default=str)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(queue_size)
+        # Events dropped since the client last read one
+        self.lag = 0
+        self.closed = False
+
+    def offer(self, message):
+        """
+        Queue a message without blocking, dropping the oldest queued one when
+        full. Returns the number of messages dropped.
+        """
+        dropped = 0
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return dropped
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        # Whatever is still queued is stale once the client has to reload anyway
+        self.closed = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.queue.put_nowait(_RESET)
+
+
+class LiveEventHub:
+    def __init__(self, queue_size=LIVE_QUEUE_SIZE, max_subscribers=LIVE_MAX_SUBSCRIBERS, heartbeat_seconds=LIVE_HEARTBEAT_SECONDS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat_seconds = heartbeat_seconds
+        # username -> subscribers in the order they connected
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def has_subscribers(self, username):
+        # Lets ingest paths skip building events nobody is listening for
+        return bool(self._subscribers.get(username))
+
+    def subscribe(self, username):
+        subscriber = Subscriber(self.queue_size)
+        with self._lock:
+            subscribers = self._subscribers.setdefault(username, OrderedDict())
+            subscribers[subscriber] = None
+            # A user with too many tabs open loses the oldest stream
+            while len(subscribers) > self.max_subscribers:
+                oldest, _ = subscribers.popitem(last=False)
+                oldest.close()
+                self.disconnected += 1
+        return subscriber
+
+    def unsubscribe(self, username, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(username)
+            if subscribers is not None:
+                subscribers.pop(subscriber, None)
+                if not subscribers:
+                    del self._subscribers[username]
+
+    def publish(self, username, event, data):
+        """
+        Send one event to every stream open for the user. Returns the number
+        of subscribers it was queued for.
+        """
+        if not self.has_subscribers(username):
+            return 0
+        with self._lock:
+            subscribers = self._subscribers.get(username)
+            if not subscribers:
+                return 0
+            message = format_event(next(self._ids), event, data)
+            self.published += 1
+            for subscriber in list(subscribers):
+                dropped = subscriber.offer(message)
+                self.delivered += 1
+                if dropped:
+                    self.dropped += dropped
+                    subscriber.lag += dropped
+                    if subscriber.lag >= self.queue_size:
+                        # A whole queue behind: cut it loose rather than keep sending it stale data
+                        del subscribers[subscriber]
+                        subscriber.close()
+                        self.disconnected += 1
+            if not subscribers:
+                del self._subscribers[username]
+            return len(subscribers)
+
+    def stream(self, username):
+        """
+        The text/event-stream body for one client. Subscribes when iteration
+        starts and unsubscribes when the client goes away.
+        """
+        subscriber = self.subscribe(username)
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n: connected\n\n"
+            while True:
+                try:
+                    message = subscriber.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is _RESET:
+                    yield format_event(next(self._ids), 'reset', {'reason': 'client too slow or replaced'})
+                    return
+                subscriber.lag = 0
+                yield message
+        finally:
+            self.unsubscribe(username, subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._subscribers),
+                'subscribers': sum(len(subscribers) for subscribers in self._subscribers.values()),
+                'queueSize': self.queue_size,
+                'published': self.published,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'disconnected': self.disconnected,
+            }
+
+
+live_event_hub = LiveEventHub()
@@ -0,0 +1,160 @@
+"""
+Process-resident registry for the 544 glucose prediction model.
+
+The trained model and its two MinMaxScalers are loaded once per worker and
+handed out as a shared ModelHandle. The registry watches the files on disk and
+swaps in a freshly loaded handle when any of them change, so a new model can be
+deployed without restarting the workers.
+
+GLUCOSE_MODEL_BACKEND=numpy serves the exported .npz weights through the
+NumPy forward pass in numpy_model.py instead of loading Keras.
+"""
+
+import os
+import threading
+import time
+
+import joblib
+
+from numpy_model import NPZ_PATH, SCALER_X_NPZ_PATH, SCALER_Y_NPZ_PATH, NumpyMinMaxScaler, load_numpy_model
+
+
+MODEL_PATH = '544_trained_model.h5'
+SCALER_X_PATH = '544_scaler_x.pkl'
+SCALER_Y_PATH = '544_scaler_y.pkl'
+
+
+def load_keras_model(model_path):
+    # Imported lazily so that workers which never predict don't pay for TensorFlow
+    from keras.models import load_model
+    return load_model(model_path)
+
+
+def _array_nbytes(obj):
+    # Sum the size of every numpy array hanging off a fitted scaler
+    total = 0
+    for value in vars(obj).values():
+        total += getattr(value, 'nbytes', 0)
+    return total
+
+
+def _model_nbytes(model):
+    # Keras models expose their weights as a list of numpy arrays
+    return sum(weight.nbytes for weight in model.get_weights())
+
+
+class ModelHandle:
+    """
+    A loaded model plus its scalers. Handles are immutable once built, so any
+    number of request threads can share the same one.
+    """
+
+    def __init__(self, model, scaler_x, scaler_y, version, load_seconds, memory_bytes, mtimes):
+        self.model = model
+        self.scaler_x = scaler_x
+        self.scaler_y = scaler_y
+        self.version = version
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.mtimes = mtimes
+        self.loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime())
+        # Keras' predict() builds its predict function lazily and isn't safe to
+        # call from several threads at once on the same model
+        self._predict_lock = threading.Lock()
+
+    def predict(self, scaled_X, batch_size=None):
+        with self._predict_lock:
+            return self.model.predict(scaled_X, batch_size=batch_size, verbose=0)
+
+
+class ModelRegistry:
+    def __init__(self, model_path=MODEL_PATH, scaler_x_path=SCALER_X_PATH, scaler_y_path=SCALER_Y_PATH,
+                 model_loader=load_keras_model, scaler_loader=joblib.load, model_nbytes=_model_nbytes,
+                 check_interval=5.0):
+        self.model_path = model_path
+        self.scaler_x_path = scaler_x_path
+        self.scaler_y_path = scaler_y_path
+        self.model_loader = model_loader
+        self.scaler_loader = scaler_loader
+        self.model_nbytes = model_nbytes
+        self.check_interval = check_interval
+
+        self._handle = None
+        self._version = 0
+        self._last_check = 0.0
+        self._load_lock = threading.Lock()
+
+    def _current_mtimes(self):
+        return tuple(os.path.getmtime(path) for path in (self.model_path, self.scaler_x_path, self.scaler_y_path))
+
+    def _load(self, mtimes):
+        started = time.perf_counter()
+        model = self.model_loader(self.model_path)
+        scaler_x = self.scaler_loader(self.scaler_x_path)
+        scaler_y = self.scaler_loader(self.scaler_y_path)
+        load_seconds = time.perf_counter() - started
+
+        memory_bytes = self.model_nbytes(model) + _array_nbytes(scaler_x) + _array_nbytes(scaler_y)
+        self._version += 1
+        return ModelHandle(model, scaler_x, scaler_y, self._version, load_seconds, memory_bytes, mtimes)
+
+    def _is_stale(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        try:
+            return self._current_mtimes() != self._handle.mtimes
+        except OSError:
+            # A deploy may be replacing the files right now; keep serving the old handle
+            return False
+
+    def get(self):
+        """
+        Return the shared handle, loading it on first use and reloading it when
+        the model or scaler files have changed on disk.
+        """
+        handle = self._handle
+        if handle is not None and not self._is_stale():
+            return handle
+
+        with self._load_lock:
+            # Another thread may have finished loading while we waited
+            if self._handle is not None and self._handle is not handle:
+                return self._handle
+            self._handle = self._load(self._current_mtimes())
+            self._last_check = time.monotonic()
+            return self._handle
+
+    def reload(self):
+        # Force a reload, e.g. from an admin endpoint after copying new files in place
+        with self._load_lock:
+            self._handle = self._load(self._current_mtimes())
+            self._last_check = time.monotonic()
+            return self._handle
+
+    def stats(self):
+        handle = self._handle
+        if handle is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'version': handle.version,
+            'loadedAt': handle.loaded_at,
+            'loadSeconds': round(handle.load_seconds, 4),
+            'memoryBytes': handle.memory_bytes,
+            'modelPath': self.model_path,
+            'backend': type(handle.model).__name__,
+        }
+
+
+def create_model_registry(backend=None):
+    backend = backend or os.environ.get('GLUCOSE_MODEL_BACKEND', 'keras')
+    if backend == 'numpy':
+        return ModelRegistry(NPZ_PATH, SCALER_X_NPZ_PATH, SCALER_Y_NPZ_PATH,
+                             model_loader=load_numpy_model, scaler_loader=NumpyMinMaxScaler.load)
+    return ModelRegistry()
+
+
+# One registry per worker process
+model_registry = create_model_registry()
@@ -0,0 +1,174 @@
+"""
+NumPy-only forward pass for the 544 glucose model.
+
+544_trained_model.h5 is a Bidirectional LSTM (128 units each way) over a single
+timestep, followed by a stack of ReLU Dense layers. Its weights are small
+enough to evaluate with plain matrix products, so workers that only need
+predictions can skip importing TensorFlow/Keras entirely.
+
+Export the weights and scaler parameters once with:
+
+    python numpy_model.py export
+
+which writes 544_trained_model.npz, 544_scaler_x.npz and 544_scaler_y.npz next
+to the originals. Set GLUCOSE_MODEL_BACKEND=numpy to have the model registry
+serve predictions from them.
+"""
+
+import sys
+
+import numpy as np
+
+
+NPZ_PATH = '544_trained_model.npz'
+SCALER_X_NPZ_PATH = '544_scaler_x.npz'
+SCALER_Y_NPZ_PATH = '544_scaler_y.npz'
+
+
+def _sigmoid(x):
+    # Same as 1 / (1 + exp(-x)) without overflowing for large negative x
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def read_h5_weights(h5_path):
+    """
+    Pull the layer weights out of a Keras .h5 file with h5py alone.
+    Returns an ordered dict of 'layer/weight' name -> array.
+    """
+    import h5py
+
+    weights = {}
+    with h5py.File(h5_path, 'r') as h5_file:
+        model_weights = h5_file['model_weights']
+        for layer_name in model_weights.attrs['layer_names']:
+            layer_group = model_weights[_decode(layer_name)]
+            for weight_name in layer_group.attrs['weight_names']:
+                weight_name = _decode(weight_name)
+                weights[weight_name] = np.asarray(layer_group[weight_name], dtype=np.float32)
+    return weights
+
+
+def export_weights(h5_path, npz_path=NPZ_PATH):
+    # The two LSTM directions and the Dense layers, stored in the order the forward pass consumes them
+    weights = read_h5_weights(h5_path)
+    np.savez_compressed(npz_path, **weights)
+    return npz_path
+
+
+def export_scaler(pkl_path, npz_path):
+    # Only unpickling the fitted MinMaxScaler needs scikit-learn; serving from the .npz doesn't
+    import joblib
+
+    scaler = joblib.load(pkl_path)
+    np.savez(npz_path, scale_=scaler.scale_, min_=scaler.min_)
+    return npz_path
+
+
+class NumpyMinMaxScaler:
+    """
+    The transform/inverse_transform half of sklearn's MinMaxScaler (clip=False).
+    """
+
+    def __init__(self, scale_, min_):
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+        self.min_ = np.asarray(min_, dtype=np.float64)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            return cls(npz['scale_'], npz['min_'])
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+
+class NumpyGlucoseModel:
+    """
+    Drop-in replacement for the Keras model's predict() on scaled inputs of
+    shape (batch, timesteps, 6).
+    """
+
+    def __init__(self, weights):
+        self.lstm = {}
+        self.dense = []
+        for name, array in weights.items():
+            if 'lstm_cell' in name:
+                # e.g. 'bidirectional_3/forward_lstm_3/lstm_cell/kernel:0'
+                direction = 'forward' if '/forward_' in name else 'backward'
+                kind = name.rsplit('/', 1)[1].split(':')[0]
+                self.lstm.setdefault(direction, {})[kind] = array
+            elif name.endswith('kernel:0'):
+                self.dense.append([array, None])
+            elif name.endswith('bias:0'):
+                self.dense[-1][1] = array
+
+    @classmethod
+    def load(cls, path=NPZ_PATH):
+        if path.endswith('.h5'):
+            return cls(read_h5_weights(path))
+        with np.load(path) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    def _lstm(self, X, direction):
+        cell = self.lstm[direction]
+        kernel, recurrent_kernel, bias = cell['kernel'], cell['recurrent_kernel'], cell['bias']
+        units = recurrent_kernel.shape[0]
+
+        steps = range(X.shape[1])
+        if direction == 'backward':
+            steps = reversed(steps)
+
+        h = np.zeros((X.shape[0], units), dtype=np.float32)
+        c = np.zeros((X.shape[0], units), dtype=np.float32)
+        for t in steps:
+            # Keras packs the gates as input, forget, cell, output
+            z = X[:, t, :] @ kernel + h @ recurrent_kernel + bias
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+        return h
+
+    def predict(self, scaled_X, batch_size=None, verbose=0):
+        X = np.asarray(scaled_X, dtype=np.float32)
+        if X.ndim == 2:
+            X = X[:, np.newaxis, :]
+
+        # Bidirectional merge_mode='concat'; Dropout layers are a no-op at inference
+        out = np.concatenate([self._lstm(X, 'forward'), self._lstm(X, 'backward')], axis=1)
+        for kernel, bias in self.dense:
+            out = _relu(out @ kernel + bias)
+        return out
+
+    def get_weights(self):
+        arrays = [array for cell in self.lstm.values() for array in cell.values()]
+        for kernel, bias in self.dense:
+            arrays.extend([kernel, bias])
+        return arrays
+
+
+def load_numpy_model(model_path):
+    # ModelRegistry loader; accepts either the exported .npz or the original .h5
+    return NumpyGlucoseModel.load(model_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'export':
+        print("Wrote", export_weights('544_trained_model.h5', NPZ_PATH))
+        print("Wrote", export_scaler('544_scaler_x.pkl', SCALER_X_NPZ_PATH))
+        print("Wrote", export_scaler('544_scaler_y.pkl', SCALER_Y_NPZ_PATH))
+    else:
+        print("Usage: python numpy_model.py export")
@@ -0,0 +1,117 @@
+"""
+Schema and updates for users/{username}/personal-metrics/personal-info.
+
+PERSONAL_METRICS_SCHEMA lists every field clients may set and the kind of
+value it takes. Any subset of fields is validated together and written with a
+single update() guarded by an exists precondition, so no read is needed to
+check for the document first. Every field also accepts null, which clears it;
+the old one-field routes have always written null when their value was missing.
+
+  number   an int or float, or a string holding one (as some clients send)
+  text     a string, or a list of strings
+  value    any string, number or boolean
+"""
+
+from document_updates import update_existing
+
+
+PERSONAL_METRICS_SCHEMA = {
+    'blood_glucose_level': 'number',
+    'predicted_hypoglycemia': 'value',
+    'predicted_hyperglycemia': 'value',
+    'height': 'number',
+    'weight': 'number',
+    'finger_stick_value': 'number',
+    'basal_value': 'number',
+    'basis_gsr_value': 'number',
+    'basis_skin_temperature_value': 'number',
+    'bolus_dose': 'number',
+    'insulin_dosage': 'number',
+    'allergies': 'text',
+    'insulin_type': 'text',
+    'physical_activity': 'value',
+    'activity_intensity': 'value',
+    'activity_duration': 'value',
+    'stress_level': 'value',
+    'illness': 'value',
+    'hormonal_changes': 'value',
+    'alcohol_consumption': 'value',
+    'medication': 'text',
+    'medication_dosage': 'value',
+    'weather_conditions': 'value',
+}
+
+
+class MetricsValidationError(ValueError):
+    """
+    Raised with every problem in an update at once, as a list of
+    {'field': ..., 'message': ...} in .errors.
+    """
+
+    def __init__(self, errors):
+        super().__init__('; '.join(f"{error['field']}: {error['message']}" for error in errors))
+        self.errors = errors
+
+
+def _is_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+
+def _check(kind, value):
+    # Returns an error message, or None when the value fits the kind
+    if value is None:
+        return None
+    if kind == 'number':
+        return None if _is_number(value) else "must be a number"
+    if kind == 'text':
+        if isinstance(value, str) or isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return None
+        return "must be a string or a list of strings"
+    if isinstance(value, (str, int, float, bool)):
+        return None
+    return "must be a string, number or boolean"
+
+
+def validate_metrics(fields, schema=PERSONAL_METRICS_SCHEMA):
+    """
+    Check a dict of field -> value against the schema. Returns the fields to
+    write; raises MetricsValidationError listing every unknown or invalid field.
+    """
+    if not isinstance(fields, dict):
+        raise MetricsValidationError([{'field': None, 'message': "expected a JSON object of fields"}])
+    if not fields:
+        raise MetricsValidationError([{'field': None, 'message': "no fields to update"}])
+
+    errors = []
+    for field, value in fields.items():
+        if field not in schema:
+            errors.append({'field': field, 'message': "is not a personal metric"})
+            continue
+        message = _check(schema[field], value)
+        if message:
+            errors.append({'field': field, 'message': message})
+    if errors:
+        raise MetricsValidationError(errors)
+    return dict(fields)
+
+
+def personal_info_ref(db, username):
+    return db.collection('users').document(username).collection('personal-metrics').document('personal-info')
+
+
+def update_personal_metrics(db, username, fields):
+    """
+    Write personal metrics that passed validate_metrics in one update. Returns
+    False when the user has no personal-info document.
+    """
+    return update_existing(db, personal_info_ref(db, username), fields)
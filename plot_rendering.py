@@ -0,0 +1,196 @@
+"""
+Thread-safe chart rendering for the dashboard plots.
+
+Charts are drawn on matplotlib.figure.Figure objects with their own Agg canvas
+instead of the global pyplot state machine, so several request threads can
+render at once. Each chart type keeps a small pool of pre-built templates: the
+figure, axes styling, spines, labels and data artists are created once, and a
+render only pushes a layout from chart_data.py into the artists before saving
+the PNG. A template is checked out by one thread at a time.
+"""
+
+import io
+import queue
+from contextlib import contextmanager
+
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from chart_data import DATA_COLOR, NORMAL_COLOR, PRESSURE_POINTS, PRESSURE_INTERVAL_SECONDS
+
+
+BACKGROUND_COLOR = '#1b2130'
+FIGURE_SIZE = (12, 7)
+
+
+def _styled_figure():
+    fig = Figure(figsize=FIGURE_SIZE, facecolor=BACKGROUND_COLOR)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_facecolor(BACKGROUND_COLOR)
+
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_visible(False)
+    ax.spines['bottom'].set_color('white')
+    ax.grid(color='gray', linestyle='--', linewidth=0.5)
+    return fig, ax
+
+
+def _style_legend(ax):
+    legend = ax.legend(facecolor=BACKGROUND_COLOR, edgecolor='white', fontsize=16, loc='upper left')
+    for text in legend.get_texts():
+        text.set_color('white')
+    return legend
+
+
+def _to_png(fig, facecolor):
+    # Start from the default margins so a layout from a previous render never leaks into this one
+    fig.subplots_adjust(**{side: rcParams['figure.subplot.' + side] for side in ('left', 'right', 'bottom', 'top')})
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', facecolor=facecolor)
+    buf.seek(0)
+    return buf
+
+
+class _TemplatePool:
+    def __init__(self, factory, max_idle=4):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+
+    @contextmanager
+    def checkout(self):
+        try:
+            template = self._idle.get_nowait()
+        except queue.Empty:
+            template = self.factory()
+        try:
+            yield template
+        finally:
+            if self._idle.qsize() < self.max_idle:
+                self._idle.put(template)
+
+
+class PressureChart:
+    def __init__(self):
+        self.fig, self.ax = _styled_figure()
+        ax = self.ax
+
+        self.timestamps = np.arange(PRESSURE_POINTS) * PRESSURE_INTERVAL_SECONDS
+        self.line, = ax.plot(self.timestamps, np.full(PRESSURE_POINTS, np.nan), label='Insole Recorded Data', color=DATA_COLOR,
+                             marker='o', markersize=12, linewidth=3, markeredgewidth=2, markeredgecolor='white')
+        self.underglow = None
+
+        ax.set_xticks(self.timestamps, [str(ts) for ts in self.timestamps], rotation=45, color='white', fontsize=12)
+        ax.tick_params(axis='y', colors='white', labelsize=12)
+        ax.set_xlabel('Time (seconds)', color='white', fontsize=16, labelpad=20, fontweight='600')
+        ax.set_ylabel('Pressure Value (kPa)', color='white', fontsize=16, labelpad=20, fontweight='600')
+        _style_legend(ax)
+
+    def render(self, layout):
+        ax = self.ax
+        values = layout['series']['y']
+        data_to_plot = np.full(PRESSURE_POINTS, np.nan)
+        data_to_plot[:len(values)] = values
+        self.line.set_ydata(data_to_plot)
+
+        if self.underglow is not None:
+            self.underglow.remove()
+            self.underglow = None
+        if values:
+            self.underglow = ax.fill_between(layout['series']['x'], values, color=DATA_COLOR, alpha=0.075)
+
+        ax.set_xlim(layout['xAxis']['min'], layout['xAxis']['max'])
+        if 'min' in layout['yAxis']:
+            ax.set_ylim(layout['yAxis']['min'], layout['yAxis']['max'])
+        else:
+            ax.set_autoscaley_on(True)
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+
+        return _to_png(self.fig, ax.get_facecolor())
+
+
+class PredictionChart:
+    def __init__(self):
+        self.fig, self.ax = _styled_figure()
+        ax = self.ax
+
+        self.line, = ax.plot([], [], label='Insole Recorded Data', color=DATA_COLOR, marker='o', markersize=12, linewidth=3,
+                             markeredgewidth=2, markeredgecolor='white')
+        self.prediction_point = ax.scatter([], [], color=NORMAL_COLOR, label='Predicted Value', zorder=5, s=250, edgecolor='white', linewidth=2)
+        self.prediction_line, = ax.plot([], [], color=NORMAL_COLOR, linestyle='--', linewidth=3)
+        self.now_line = ax.axvline(x=0, color='white', linestyle='--', linewidth=1.5, alpha=0.8)
+        self.underglows = []
+
+        bbox_props = dict(boxstyle="round,pad=0.3", fc="black", ec="none", alpha=0.8)
+        self.text_now = ax.text(0, 0, '', color='white', fontsize=15, ha='center', va='center', bbox=bbox_props, linespacing=1.5)
+        self.text_future = ax.text(0, 0, '', color='white', fontsize=15, ha='center', va='center', bbox=bbox_props, linespacing=1.5)
+
+        ax.xaxis_date()
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%I:%M %p'))
+        ax.tick_params(axis='x', labelrotation=45, colors='white', labelsize=16)
+        ax.tick_params(axis='y', colors='white', labelsize=16)
+        ax.set_xlabel('Time (Hourly)', color='white', fontsize=20, labelpad=20, fontweight='600')
+        ax.set_ylabel('Glucose Level (mg/dL)', color='white', fontsize=20, labelpad=20, fontweight='550')
+
+    def render(self, layout):
+        ax = self.ax
+        series, prediction, segment = layout['series'], layout['prediction'], layout['predictionSegment']
+        x = mdates.date2num(series['x'])
+        segment_x = mdates.date2num(segment['x'])
+        predicted_time = mdates.date2num(prediction['x'])
+        baseline = layout['underglowBaseline']
+
+        self.line.set_data(x, series['y'])
+        self.prediction_point.set_offsets([[predicted_time, prediction['y']]])
+        self.prediction_point.set_facecolor(prediction['color'])
+        self.prediction_line.set_data(segment_x, segment['y'])
+        self.prediction_line.set_color(prediction['color'])
+        now_x = mdates.date2num(layout['nowLine']['x'])
+        self.now_line.set_xdata([now_x, now_x])
+
+        # Underglow effects for the recorded data and the predicted segment
+        for underglow in self.underglows:
+            underglow.remove()
+        self.underglows = [
+            ax.fill_between(x, series['y'], y2=baseline, color=series['color'], alpha=0.075),
+            ax.fill_between(segment_x, segment['y'], y2=baseline, color=prediction['color'], alpha=0.075),
+        ]
+
+        ax.set_xlim([mdates.date2num(layout['xAxis']['min']), mdates.date2num(layout['xAxis']['max'])])
+        ax.set_ylim(layout['yAxis']['min'], layout['yAxis']['max'])
+
+        for text, annotation in zip((self.text_now, self.text_future), layout['annotations']):
+            text.set_position((mdates.date2num(annotation['x']), annotation['y']))
+            text.set_text(annotation['text'])
+
+        # Rebuilt per render so the 'Predicted Value' swatch follows the alert colour
+        _style_legend(ax)
+
+        return _to_png(self.fig, self.fig.get_facecolor())
+
+
+_pressure_charts = _TemplatePool(PressureChart)
+_prediction_charts = _TemplatePool(PredictionChart)
+
+
+def render_pressure_chart(layout):
+    """
+    Render a chart_data.pressure_chart_data() layout as a PNG buffer.
+    """
+    with _pressure_charts.checkout() as chart:
+        return chart.render(layout)
+
+
+def render_prediction_chart(layout):
+    """
+    Render a chart_data.prediction_chart_data() layout as a PNG buffer.
+    """
+    with _prediction_charts.checkout() as chart:
+        return chart.render(layout)
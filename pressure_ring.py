@@ -0,0 +1,196 @@
+"""
+In-process ring buffers of each active patient's most recent pressure samples.
+
+Every ingest path appends what it wrote, so the live plot and other "latest N"
+reads are answered from memory. Firestore is only read to fill a user's
+buffer the first time it is needed (a cold start), or for a range the buffer
+can't fully answer. Buffers for the least recently used patients are dropped
+once more than PRESSURE_RING_USERS are held.
+
+The buffers only see samples ingested by this process, so they assume a
+patient's uploads reach the worker that serves their dashboard (a single
+worker, or sticky routing). Set PRESSURE_RING_SIZE=0 to turn them off.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from pressure_rollups import CHANNELS
+
+
+PRESSURE_RING_SIZE = int(os.environ.get('PRESSURE_RING_SIZE', 1024))
+PRESSURE_RING_USERS = int(os.environ.get('PRESSURE_RING_USERS', 256))
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_micros(timestamp):
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    delta = timestamp - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(micros):
+    return _EPOCH + timedelta(microseconds=int(micros))
+
+
+class PressureRing:
+    """
+    The newest `capacity` samples for one user, oldest first, in preallocated
+    arrays: int64 epoch microseconds and an (capacity, 6) float64 array.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.micros = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(CHANNELS)), np.nan)
+        self.start = 0
+        self.size = 0
+        # Set once the buffer has been filled from Firestore, so it holds everything newer than its oldest sample
+        self.warm = False
+
+    def _ordered(self):
+        order = (self.start + np.arange(self.size)) % self.capacity
+        return self.micros[order], self.values[order]
+
+    def extend(self, micros, values):
+        micros = np.asarray(micros, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(CHANNELS))
+        if not len(micros):
+            return
+
+        newest = self.micros[(self.start + self.size - 1) % self.capacity] if self.size else None
+        if newest is not None and micros.min() <= newest or np.any(np.diff(micros) <= 0):
+            # Late or unordered samples: merge everything, keep one sample per timestamp and the newest capacity
+            held_micros, held_values = self._ordered()
+            all_micros = np.concatenate([held_micros, micros])
+            all_values = np.concatenate([held_values, values])
+            # Last occurrence wins, so a re-sent sample replaces the held one
+            reverse_unique = np.unique(all_micros[::-1], return_index=True)[1]
+            keep = len(all_micros) - 1 - reverse_unique
+            micros, values = all_micros[keep][-self.capacity:], all_values[keep][-self.capacity:]
+            self.start = self.size = 0
+        elif len(micros) > self.capacity:
+            micros, values = micros[-self.capacity:], values[-self.capacity:]
+
+        count = len(micros)
+        positions = (self.start + self.size + np.arange(count)) % self.capacity
+        self.micros[positions] = micros
+        self.values[positions] = values
+        overflow = max(0, self.size + count - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + count)
+
+    def latest(self, start, end, limit):
+        """
+        The newest `limit` samples with start <= timestamp <= end as
+        (epoch micros, values) oldest first, or None when samples older than
+        the buffer could belong in the answer.
+        """
+        micros, values = self._ordered()
+        lo, hi = _to_micros(start), _to_micros(end)
+        in_range = np.flatnonzero((micros >= lo) & (micros <= hi))
+        complete = len(in_range) >= limit or self.size < self.capacity or (self.size and micros[0] <= lo)
+        if not complete:
+            return None
+        in_range = in_range[-limit:]
+        return micros[in_range], values[in_range]
+
+
+class PressureRingStore:
+    def __init__(self, capacity=PRESSURE_RING_SIZE, max_users=PRESSURE_RING_USERS):
+        self.capacity = capacity
+        self.max_users = max_users
+        self._rings = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.cold_loads = 0
+
+    @property
+    def enabled(self):
+        return self.capacity > 0 and self.max_users > 0
+
+    def _ring(self, username):
+        ring = self._rings.get(username)
+        if ring is None:
+            ring = self._rings[username] = PressureRing(self.capacity)
+            while len(self._rings) > self.max_users:
+                self._rings.popitem(last=False)
+        self._rings.move_to_end(username)
+        return ring
+
+    def append(self, username, timestamps, values):
+        """
+        Record samples that were just written for a user.
+        """
+        if not self.enabled or not len(timestamps):
+            return
+        micros = [_to_micros(timestamp) for timestamp in timestamps]
+        with self._lock:
+            self._ring(username).extend(micros, values)
+
+    def latest(self, username, start, end, limit, load):
+        """
+        The newest `limit` samples in [start, end] as (timestamps, values),
+        oldest first. load(limit) is called on a cold start to fetch the
+        user's newest samples from Firestore; when the buffer can't answer
+        the range, None is returned and the caller reads Firestore itself.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            ring = self._ring(username)
+            warm = ring.warm
+        if not warm:
+            timestamps, values = load(self.capacity)
+            with self._lock:
+                ring = self._ring(username)
+                if not ring.warm:
+                    ring.extend([_to_micros(timestamp) for timestamp in timestamps], values)
+                    ring.warm = True
+                    self.cold_loads += 1
+
+        with self._lock:
+            result = ring.latest(start, end, limit)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        micros, values = result
+        return [_from_micros(m) for m in micros], values
+
+    def recent(self, username, since):
+        """
+        Values of the held samples newer than `since`, straight from memory:
+        no cold start, so a buffer that isn't warm only has what this process
+        ingested.
+        """
+        if not self.enabled:
+            return np.empty((0, len(CHANNELS)))
+        with self._lock:
+            ring = self._rings.get(username)
+            if ring is None:
+                return np.empty((0, len(CHANNELS)))
+            micros, values = ring._ordered()
+        return values[micros >= _to_micros(since)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._rings),
+                'maxUsers': self.max_users,
+                'samplesPerUser': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coldLoads': self.cold_loads,
+            }
+
+
+pressure_ring_store = PressureRingStore()
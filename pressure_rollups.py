@@ -0,0 +1,283 @@
+"""
+Pre-aggregated pressure statistics.
+
+For every minute, hour and UTC day that has samples, a rollup document in
+users/{username}/pressureRollupMinutes, pressureRollupHours or
+pressureRollupDays holds, per region p1..p6:
+
+    {'count': ..., 'sum': ..., 'min': ..., 'max': ..., 'sumSquares': ...}
+
+The ingest paths add to these with Firestore Increment/Minimum/Maximum
+transforms in the same batch or transaction as the samples themselves, so a
+chunk that fails leaves the rollups untouched. A range is answered by covering
+it with the fewest whole days, hours and minutes, plus the raw samples in the
+partial minutes at either end.
+
+Rollups only know about samples ingested while they were being maintained.
+PRESSURE_ROLLUPS_SINCE (an ISO timestamp) marks where they become complete;
+anything before it is computed from raw samples. Leave it unset to keep every
+read on raw samples, and use rebuild_pressure_rollups to backfill history.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+
+CHANNELS = ['p1', 'p2', 'p3', 'p4', 'p5', 'p6']
+
+ROLLUP_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+ROLLUP_COLLECTIONS = {'minute': 'pressureRollupMinutes', 'hour': 'pressureRollupHours', 'day': 'pressureRollupDays'}
+
+
+def _parse_since(value):
+    if not value:
+        return None
+    since = datetime.fromisoformat(value)
+    return since.replace(tzinfo=timezone.utc) if since.tzinfo is None else since
+
+
+PRESSURE_ROLLUPS_SINCE = _parse_since(os.environ.get('PRESSURE_ROLLUPS_SINCE'))
+
+
+class PressureStats:
+    """
+    count, sum, min, max and sum of squares for each of the six regions.
+    Stats for disjoint sets of samples combine with merge().
+    """
+
+    def __init__(self, count=None, total=None, minimum=None, maximum=None, sum_squares=None):
+        channels = len(CHANNELS)
+        self.count = np.zeros(channels, dtype=np.int64) if count is None else count
+        self.sum = np.zeros(channels) if total is None else total
+        self.min = np.full(channels, np.inf) if minimum is None else minimum
+        self.max = np.full(channels, -np.inf) if maximum is None else maximum
+        self.sum_squares = np.zeros(channels) if sum_squares is None else sum_squares
+
+    @classmethod
+    def from_values(cls, values):
+        # NaN marks a region that was missing (or not a number) in a sample
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(CHANNELS))
+        present = np.isfinite(values)
+        return cls(
+            present.sum(axis=0),
+            np.where(present, values, 0).sum(axis=0),
+            np.where(present, values, np.inf).min(axis=0, initial=np.inf),
+            np.where(present, values, -np.inf).max(axis=0, initial=-np.inf),
+            np.where(present, values * values, 0).sum(axis=0),
+        )
+
+    @classmethod
+    def from_document(cls, document):
+        stats = cls()
+        for index, channel in enumerate(CHANNELS):
+            channel_stats = document.get(channel)
+            if channel_stats:
+                stats.count[index] = channel_stats['count']
+                stats.sum[index] = channel_stats['sum']
+                stats.min[index] = channel_stats['min']
+                stats.max[index] = channel_stats['max']
+                stats.sum_squares[index] = channel_stats['sumSquares']
+        return stats
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum += other.sum
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.sum_squares += other.sum_squares
+        return self
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.sum / self.count, np.nan)
+
+    def variance(self):
+        # Population variance; clipped because sumSquares/count - mean^2 can dip just below zero
+        mean = self.mean()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.maximum(np.where(self.count > 0, self.sum_squares / self.count - mean * mean, np.nan), 0)
+
+    def region(self, channel):
+        # Plain Python numbers for one region, None where there is no data
+        index = CHANNELS.index(channel)
+        if not self.count[index]:
+            return {'count': 0, 'mean': None, 'variance': None, 'min': None, 'max': None}
+        return {
+            'count': int(self.count[index]),
+            'mean': float(self.mean()[index]),
+            'variance': float(self.variance()[index]),
+            'min': float(self.min[index]),
+            'max': float(self.max[index]),
+        }
+
+
+def rollup_values(row):
+    # add_pressure_value stores whatever the device sent; anything non-numeric is left out of the rollups
+    values = []
+    for value in row:
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            values.append(np.nan)
+    return values
+
+
+def compute_rollups(timestamps, values):
+    """
+    Stats for every minute, hour and day the samples touch, as a dict of
+    (resolution, start) -> PressureStats.
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(CHANNELS))
+    epoch_seconds = np.array([timestamp.timestamp() for timestamp in timestamps])
+    rollups = {}
+    for resolution, seconds in ROLLUP_SECONDS.items():
+        periods = (epoch_seconds // seconds).astype(np.int64)
+        for period in np.unique(periods):
+            start = datetime.fromtimestamp(int(period) * seconds, tz=timezone.utc)
+            rollups[(resolution, start)] = PressureStats.from_values(values[periods == period])
+    return rollups
+
+
+def rollup_document_id(start):
+    return '%d' % start.timestamp()
+
+
+def add_rollup_writes(writer, user_ref, rollups):
+    """
+    Queue the rollup increments on a WriteBatch or Transaction, so they commit
+    together with the samples they describe. Returns the number of writes.
+    """
+    # Imported here so the stats helpers stay usable without the Firebase SDK
+    from firebase_admin import firestore
+
+    for (resolution, start), stats in rollups.items():
+        document = {'start': start, 'resolution': resolution}
+        for index, channel in enumerate(CHANNELS):
+            if stats.count[index]:
+                document[channel] = {
+                    'count': firestore.Increment(int(stats.count[index])),
+                    'sum': firestore.Increment(float(stats.sum[index])),
+                    'min': firestore.Minimum(float(stats.min[index])),
+                    'max': firestore.Maximum(float(stats.max[index])),
+                    'sumSquares': firestore.Increment(float(stats.sum_squares[index])),
+                }
+        ref = user_ref.collection(ROLLUP_COLLECTIONS[resolution]).document(rollup_document_id(start))
+        writer.set(ref, document, merge=True)
+    return len(rollups)
+
+
+def _floor(timestamp, seconds):
+    return datetime.fromtimestamp(int(timestamp.timestamp() // seconds) * seconds, tz=timezone.utc)
+
+
+def _ceil(timestamp, seconds):
+    floored = _floor(timestamp, seconds)
+    return floored if floored == timestamp else floored + timedelta(seconds=seconds)
+
+
+def rollup_cover(start, end):
+    """
+    Split the minute-aligned half-open range [start, end) into the fewest
+    (resolution, start, end) pieces of whole days, hours and minutes.
+    """
+    pieces = []
+
+    def split(lo, hi, resolutions):
+        if lo >= hi:
+            return
+        resolution, finer = resolutions[0], resolutions[1:]
+        seconds = ROLLUP_SECONDS[resolution]
+        first, last = _ceil(lo, seconds), _floor(hi, seconds)
+        if first < last:
+            pieces.append((resolution, first, last))
+            split(lo, first, finer)
+            split(last, hi, finer)
+        else:
+            split(lo, hi, finer)
+
+    split(start, end, ['day', 'hour', 'minute'])
+    return sorted(pieces, key=lambda piece: piece[1])
+
+
+def _raw_stats(db, username, start, end):
+    if start > end:
+        return PressureStats()
+    # Imported here to avoid a circular import; pressure_store writes rollups on ingest
+    from pressure_store import read_pressure_samples
+    _, values = read_pressure_samples(db, username, start, end)
+    return PressureStats.from_values(values)
+
+
+def read_pressure_stats(db, username, start, end, since=None):
+    """
+    Stats for samples with start <= timestamp <= end, answered from rollups
+    wherever they are complete and from raw samples elsewhere.
+    """
+    since = PRESSURE_ROLLUPS_SINCE if since is None else since
+    start = start.replace(tzinfo=timezone.utc) if start.tzinfo is None else start
+    end = end.replace(tzinfo=timezone.utc) if end.tzinfo is None else end
+
+    if since is None or end < since:
+        return _raw_stats(db, username, start, end)
+
+    stats = PressureStats()
+    user_ref = db.collection('users').document(username)
+
+    # Whole minutes from the later of start and since, up to the minute end falls in
+    covered_start = _ceil(max(start, since), ROLLUP_SECONDS['minute'])
+    covered_end = _floor(end, ROLLUP_SECONDS['minute'])
+    if covered_start >= covered_end:
+        return _raw_stats(db, username, start, end)
+
+    # Raw samples before the covered minutes, and in the partial minute at the end (end is inclusive)
+    stats.merge(_raw_stats(db, username, start, covered_start - timedelta(microseconds=1)))
+    stats.merge(_raw_stats(db, username, covered_end, end))
+
+    for resolution, piece_start, piece_end in rollup_cover(covered_start, covered_end):
+        query = user_ref.collection(ROLLUP_COLLECTIONS[resolution]).where('start', '>=', piece_start)\
+                                                                   .where('start', '<', piece_end)
+        for doc in query.stream():
+            stats.merge(PressureStats.from_document(doc.to_dict()))
+
+    return stats
+
+
+def rebuild_pressure_rollups(db, username, start, end):
+    """
+    Recompute the rollups for every UTC day touching [start, end] from raw
+    samples, replacing what is stored. Used to backfill history or repair
+    rollups after samples were re-sent. Returns the number of rollup documents
+    written.
+    """
+    from pressure_store import MAX_BATCH_WRITES, read_pressure_samples
+
+    start = start.replace(tzinfo=timezone.utc) if start.tzinfo is None else start
+    end = end.replace(tzinfo=timezone.utc) if end.tzinfo is None else end
+    day_start = _floor(start, ROLLUP_SECONDS['day'])
+    day_end = _floor(end, ROLLUP_SECONDS['day']) + timedelta(days=1)
+
+    timestamps, values = read_pressure_samples(db, username, day_start, day_end - timedelta(microseconds=1))
+    rollups = compute_rollups(timestamps, values)
+
+    user_ref = db.collection('users').document(username)
+    items = list(rollups.items())
+    for offset in range(0, len(items), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for (resolution, rollup_start_time), stats in items[offset:offset + MAX_BATCH_WRITES]:
+            document = {'start': rollup_start_time, 'resolution': resolution}
+            for index, channel in enumerate(CHANNELS):
+                if stats.count[index]:
+                    document[channel] = {
+                        'count': int(stats.count[index]),
+                        'sum': float(stats.sum[index]),
+                        'min': float(stats.min[index]),
+                        'max': float(stats.max[index]),
+                        'sumSquares': float(stats.sum_squares[index]),
+                    }
+            ref = user_ref.collection(ROLLUP_COLLECTIONS[resolution]).document(rollup_document_id(rollup_start_time))
+            batch.set(ref, document)
+        batch.commit()
+
+    return len(items)
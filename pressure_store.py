@@ -0,0 +1,480 @@
+"""
+Storage layer for insole pressure samples.
+
+A sample is a timestamp plus the six channel readings p1..p6. Batches of
+samples move around as a list of timezone-aware datetimes and an (N, 6)
+float array, which is what the ingest endpoints validate into and what the
+Firestore writers below consume.
+
+Samples are stored in one of two layouts, chosen with PRESSURE_STORAGE_MODE:
+
+  sample          one document per sample in users/{username}/pressureData
+  minute, hour    one document per minute or hour in
+                  users/{username}/pressureMinutes or pressureHours, holding
+                  parallel arrays: 'offsets' (microseconds from the bucket's
+                  'start') and p1..p6
+
+The mode applies to the batch and frame ingest paths. Single readings from
+/add_pressure_value always get their own document, since merging each one
+into a bucket would rewrite the whole bucket per reading.
+
+Bucket reads cost one document read per bucket instead of one per sample. The
+readers below always merge both layouts, so switching modes never hides data
+that was written before the switch.
+
+A bucket holds at most MAX_BUCKET_SAMPLES samples, which keeps its array
+elements under Firestore's 40,000 index entries per document. That is about
+83 Hz for minute buckets and 1.4 Hz for hour buckets; a merge that would go
+past it fails, and the samples should be stored with a shorter resolution.
+
+Both writers also update the per-region rollups in pressure_rollups.py in the
+same batch or transaction.
+"""
+
+import heapq
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from pagination import stream_range
+from pressure_rollups import CHANNELS, add_rollup_writes, compute_rollups
+
+
+# Firestore rejects batched writes with more than 500 operations
+MAX_BATCH_WRITES = 500
+
+BUCKET_SECONDS = {'minute': 60, 'hour': 3600}
+BUCKET_COLLECTIONS = {'minute': 'pressureMinutes', 'hour': 'pressureHours'}
+STORAGE_MODES = ['sample'] + list(BUCKET_SECONDS)
+PRESSURE_STORAGE_MODE = os.environ.get('PRESSURE_STORAGE_MODE', 'sample')
+
+# Firestore indexes every array element and allows 40,000 index entries per document; a bucket holds
+# seven arrays (offsets, p1..p6), so 5,000 samples is 35,000 entries and about 280 KB
+MAX_BUCKET_SAMPLES = 5000
+
+
+# Binary frame: header, then sample_count little-endian float32 rows of p1..p6
+#   magic 'ISP1' | version u8 | channels u8 | reserved u16 | base timestamp f64 (epoch seconds, UTC)
+#   | sample rate f32 (Hz) | sample count u32
+FRAME_MAGIC = b'ISP1'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sBBHdfI')
+FRAME_DTYPE = np.dtype('<f4')
+
+
+class PressureValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid sample(s)")
+        self.errors = errors
+
+
+def parse_timestamp(value):
+    # ISO 8601 strings or seconds since the epoch; naive times are taken as UTC like Firestore does
+    if isinstance(value, bool):
+        raise ValueError("invalid timestamp")
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def _is_finite_row(row):
+    try:
+        return bool(np.isfinite(np.array(row, dtype=np.float64)).all())
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_pressure_samples(samples, max_samples=None):
+    """
+    Validate a JSON list of {'timestamp': ..., 'p1': ..., ..., 'p6': ...}
+    samples in one pass; timestamps must be unique within the list. Returns
+    (timestamps, values) or raises ValueError listing every bad sample.
+    """
+    if not isinstance(samples, list) or not samples:
+        raise ValueError("samples must be a non-empty list")
+    if max_samples is not None and len(samples) > max_samples:
+        raise ValueError(f"at most {max_samples} samples can be sent per request")
+
+    errors = []
+    timestamps = []
+    rows = []
+    row_indexes = []
+    # Timestamp -> index of the first sample with it; a second one would overwrite its document
+    seen = {}
+    for index, sample in enumerate(samples):
+        if not isinstance(sample, dict):
+            errors.append({'index': index, 'message': "sample must be an object"})
+            continue
+        missing = [channel for channel in CHANNELS if sample.get(channel) is None]
+        if missing or 'timestamp' not in sample:
+            errors.append({'index': index, 'message': "missing " + ", ".join((['timestamp'] if 'timestamp' not in sample else []) + missing)})
+            continue
+        try:
+            timestamp = parse_timestamp(sample['timestamp'])
+        except (TypeError, ValueError, OverflowError, OSError):
+            errors.append({'index': index, 'message': "invalid timestamp"})
+            continue
+        if timestamp in seen:
+            errors.append({'index': index, 'message': f"duplicate timestamp, also used by sample {seen[timestamp]}"})
+            continue
+        seen[timestamp] = index
+        timestamps.append(timestamp)
+        rows.append([sample[channel] for channel in CHANNELS])
+        row_indexes.append(index)
+
+    # One conversion for the whole batch; only if that fails are rows checked one by one
+    try:
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(CHANNELS))
+        bad_rows = np.flatnonzero(~np.isfinite(values).all(axis=1)).tolist()
+    except (TypeError, ValueError):
+        values = None
+        bad_rows = [row for row in range(len(rows)) if not _is_finite_row(rows[row])]
+    errors.extend({'index': row_indexes[row], 'message': "p1..p6 must be finite numbers"} for row in bad_rows)
+    errors.sort(key=lambda error: error['index'])
+
+    if errors:
+        raise PressureValidationError(errors)
+    return timestamps, values
+
+
+def pack_pressure_frame(base_timestamp, sample_rate, values):
+    """
+    Build a binary frame from an (N, 6) array, as the insole firmware does.
+    """
+    values = np.ascontiguousarray(values, dtype=FRAME_DTYPE)
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(CHANNELS), 0, base_timestamp, sample_rate, len(values))
+    return header + values.tobytes()
+
+
+def parse_pressure_frame(data, max_samples=None):
+    """
+    Decode a binary frame into (timestamps, values) like
+    parse_pressure_samples. values is a read-only float32 view over data,
+    not a copy. Sample i is taken at base timestamp + i / sample rate.
+    """
+    if len(data) < FRAME_HEADER.size:
+        raise ValueError("frame is shorter than its header")
+    magic, version, channels, _, base_timestamp, sample_rate, count = FRAME_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError("not a version %d pressure frame" % FRAME_VERSION)
+    if channels != len(CHANNELS):
+        raise ValueError(f"frame has {channels} channels, expected {len(CHANNELS)}")
+    if not np.isfinite(sample_rate) or sample_rate <= 0:
+        raise ValueError("sample rate must be positive")
+    if count == 0:
+        raise ValueError("frame has no samples")
+    if max_samples is not None and count > max_samples:
+        raise ValueError(f"at most {max_samples} samples can be sent per request")
+    expected = FRAME_HEADER.size + count * channels * FRAME_DTYPE.itemsize
+    if len(data) != expected:
+        raise ValueError(f"frame is {len(data)} bytes, expected {expected} for {count} samples")
+
+    values = np.frombuffer(data, dtype=FRAME_DTYPE, count=count * channels, offset=FRAME_HEADER.size).reshape(count, channels)
+    bad_rows = np.flatnonzero(~np.isfinite(values).all(axis=1))
+    if len(bad_rows):
+        raise PressureValidationError([{'index': int(row), 'message': "p1..p6 must be finite numbers"} for row in bad_rows])
+
+    try:
+        base = datetime.fromtimestamp(base_timestamp, tz=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError("invalid base timestamp")
+    # Whole microseconds, so sample document ids and bucket offsets stay exact
+    offsets = np.rint(np.arange(count) * (1_000_000 / sample_rate)).astype(np.int64).tolist()
+    timestamps = [base + timedelta(microseconds=offset) for offset in offsets]
+    return timestamps, values
+
+
+def sample_document_id(timestamp):
+    # Derived from the timestamp so a retried chunk overwrites instead of duplicating
+    return '%d' % round(timestamp.timestamp() * 1_000_000)
+
+
+def write_pressure_samples(db, username, timestamps, values, chunk_size=MAX_BATCH_WRITES):
+    """
+    Write samples to users/{username}/pressureData with batched writes of up
+    to chunk_size documents, together with their rollup updates. Returns one
+    acknowledgement per chunk so callers can retry only the chunks that
+    failed.
+    """
+    user_ref = db.collection('users').document(username)
+    pressure_data_ref = user_ref.collection('pressureData')
+    chunk_size = min(chunk_size, MAX_BATCH_WRITES)
+
+    acknowledgements = []
+    start = 0
+    while start < len(timestamps):
+        end = min(start + chunk_size, len(timestamps))
+        rollups = compute_rollups(timestamps[start:end], values[start:end])
+        # Sparse samples touch many rollups; shrink the chunk until samples and rollups fit in one batch
+        while end - start + len(rollups) > MAX_BATCH_WRITES:
+            end = start + (end - start) // 2
+            rollups = compute_rollups(timestamps[start:end], values[start:end])
+
+        batch = db.batch()
+        for timestamp, row in zip(timestamps[start:end], values[start:end].tolist()):
+            document = dict(zip(CHANNELS, row))
+            document['timestamp'] = timestamp
+            batch.set(pressure_data_ref.document(sample_document_id(timestamp)), document)
+        add_rollup_writes(batch, user_ref, rollups)
+
+        acknowledgement = {'chunk': len(acknowledgements), 'start': start, 'end': end, 'count': end - start}
+        try:
+            batch.commit()
+            acknowledgement['success'] = True
+        except Exception as e:
+            acknowledgement['success'] = False
+            acknowledgement['message'] = str(e)
+        acknowledgements.append(acknowledgement)
+        start = end
+
+    return acknowledgements
+
+
+def bucket_start(timestamp, resolution):
+    seconds = BUCKET_SECONDS[resolution]
+    epoch_seconds = int(timestamp.timestamp() // seconds) * seconds
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc)
+
+
+def bucket_document_id(start):
+    return '%d' % start.timestamp()
+
+
+def group_by_bucket(timestamps, resolution):
+    """
+    Group sample indexes by the bucket they fall into. Returns an ordered
+    dict of bucket start -> list of indexes into timestamps.
+    """
+    groups = {}
+    for index, timestamp in enumerate(timestamps):
+        groups.setdefault(bucket_start(timestamp, resolution), []).append(index)
+    return dict(sorted(groups.items()))
+
+
+def _offset(timestamp, start):
+    delta = timestamp - start
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def merge_bucket(document, start, resolution, timestamps, values):
+    """
+    Merge samples into a bucket document (None for a new bucket). A sample
+    already in the bucket at the same offset is replaced, so retries are
+    idempotent. Returns the new document.
+    """
+    samples = {}
+    if document:
+        for index, offset in enumerate(document['offsets']):
+            samples[offset] = [document[channel][index] for channel in CHANNELS]
+    for timestamp, row in zip(timestamps, values):
+        samples[_offset(timestamp, start)] = list(row)
+
+    if len(samples) > MAX_BUCKET_SAMPLES:
+        raise ValueError(f"bucket would hold more than {MAX_BUCKET_SAMPLES} samples; use a shorter bucket resolution")
+
+    offsets = sorted(samples)
+    merged = {
+        'start': start,
+        'end': start + timedelta(seconds=BUCKET_SECONDS[resolution]),
+        'resolution': resolution,
+        'count': len(offsets),
+        'offsets': offsets,
+    }
+    for channel_index, channel in enumerate(CHANNELS):
+        merged[channel] = [samples[offset][channel_index] for offset in offsets]
+    return merged
+
+
+def unpack_bucket(document):
+    """
+    Expand a bucket document into (timestamps, values) like
+    parse_pressure_samples returns.
+    """
+    start = document['start']
+    timestamps = [start + timedelta(microseconds=offset) for offset in document['offsets']]
+    values = np.column_stack([np.asarray(document[channel], dtype=np.float64) for channel in CHANNELS]) \
+        if timestamps else np.empty((0, len(CHANNELS)))
+    return timestamps, values
+
+
+def write_pressure_buckets(db, username, timestamps, values, resolution):
+    """
+    Merge samples into the user's minute or hour buckets, one transaction per
+    bucket (with its rollup updates) so concurrent writers to the same bucket
+    never drop samples.
+    Returns one acknowledgement per bucket listing the sample indexes it
+    covered, so callers can retry only what failed.
+    """
+    # Imported here so the validation and bucket helpers stay usable without the Firebase SDK
+    from firebase_admin import firestore
+
+    @firestore.transactional
+    def merge_in_transaction(transaction, bucket_ref, start, bucket_timestamps, bucket_values):
+        snapshot = bucket_ref.get(transaction=transaction)
+        document = snapshot.to_dict() if snapshot.exists else None
+        transaction.set(bucket_ref, merge_bucket(document, start, resolution, bucket_timestamps, bucket_values))
+
+        # Only samples new to the bucket count towards the rollups, so a retried request isn't counted twice
+        stored = set(document['offsets']) if document else set()
+        fresh = {}
+        for timestamp, row in zip(bucket_timestamps, bucket_values):
+            if _offset(timestamp, start) not in stored:
+                fresh[timestamp] = row
+        if fresh:
+            add_rollup_writes(transaction, user_ref, compute_rollups(list(fresh), list(fresh.values())))
+
+    user_ref = db.collection('users').document(username)
+    buckets_ref = user_ref.collection(BUCKET_COLLECTIONS[resolution])
+
+    acknowledgements = []
+    for chunk_index, (start, indexes) in enumerate(group_by_bucket(timestamps, resolution).items()):
+        bucket_id = bucket_document_id(start)
+        acknowledgement = {'chunk': chunk_index, 'bucket': bucket_id, 'indexes': indexes, 'count': len(indexes)}
+        try:
+            merge_in_transaction(db.transaction(), buckets_ref.document(bucket_id), start,
+                                 [timestamps[index] for index in indexes], values[indexes].tolist())
+            acknowledgement['success'] = True
+        except Exception as e:
+            acknowledgement['success'] = False
+            acknowledgement['message'] = str(e)
+        acknowledgements.append(acknowledgement)
+
+    return acknowledgements
+
+
+def store_pressure_samples(db, username, timestamps, values, mode=None):
+    """
+    Write validated samples using the configured storage mode.
+    """
+    mode = mode or PRESSURE_STORAGE_MODE
+    if mode == 'sample':
+        return write_pressure_samples(db, username, timestamps, values)
+    if mode in BUCKET_SECONDS:
+        return write_pressure_buckets(db, username, timestamps, values, mode)
+    raise ValueError(f"unknown pressure storage mode '{mode}'; expected one of {', '.join(STORAGE_MODES)}")
+
+
+def _as_utc(timestamp):
+    # Firestore reads naive datetimes as UTC; do the same when filtering bucket contents
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
+
+def written_sample_indexes(acknowledgements):
+    """
+    Indexes of the samples in chunks that were acknowledged as written.
+    """
+    indexes = []
+    for acknowledgement in acknowledgements:
+        if acknowledgement['success']:
+            if 'indexes' in acknowledgement:
+                indexes.extend(acknowledgement['indexes'])
+            else:
+                indexes.extend(range(acknowledgement['start'], acknowledgement['end']))
+    return sorted(indexes)
+
+
+def read_pressure_samples(db, username, start, end, descending=False, limit=None, after=None):
+    """
+    Samples with start <= timestamp <= end from both storage layouts, as
+    (timestamps, values) ordered by timestamp. With limit, only the newest
+    (descending=True) or oldest samples are returned. after skips everything
+    up to and including that timestamp, for reading the range page by page.
+    """
+    start, end = _as_utc(start), _as_utc(end)
+    after = _as_utc(after) if after is not None else None
+    user_ref = db.collection('users').document(username)
+    direction = 'DESCENDING' if descending else 'ASCENDING'
+    samples = {}
+
+    # Per-sample documents
+    query = user_ref.collection('pressureData').where('timestamp', '>=', start)\
+                                               .where('timestamp', '<=', end)\
+                                               .order_by('timestamp', direction=direction)
+    if after is not None:
+        query = query.start_after({'timestamp': after})
+    if limit is not None:
+        query = query.limit(limit)
+    for doc in query.stream():
+        document = doc.to_dict()
+        samples[document['timestamp']] = [np.nan if document.get(channel) is None else document[channel] for channel in CHANNELS]
+
+    # Buckets that overlap the range; a bucket can start up to one span before it
+    lower = start if after is None else max(start, after)
+    for resolution, collection in BUCKET_COLLECTIONS.items():
+        span = timedelta(seconds=BUCKET_SECONDS[resolution])
+        query = user_ref.collection(collection).where('start', '>', lower - span)\
+                                               .where('start', '<=', end)\
+                                               .order_by('start', direction=direction)
+        for doc in query.stream():
+            document = doc.to_dict()
+            if limit is not None and len(samples) >= limit:
+                # Stop once this bucket, and so every later one, can't beat what is already collected
+                cutoff = sorted(samples, reverse=descending)[limit - 1]
+                if (document['start'] + span <= cutoff) if descending else (document['start'] > cutoff):
+                    break
+            bucket_timestamps, bucket_values = unpack_bucket(document)
+            for timestamp, row in zip(bucket_timestamps, bucket_values.tolist()):
+                if start <= timestamp <= end and (after is None or timestamp > after):
+                    samples[timestamp] = row
+
+    timestamps = sorted(samples)
+    if limit is not None:
+        timestamps = timestamps[-limit:] if descending else timestamps[:limit]
+    values = np.array([samples[timestamp] for timestamp in timestamps], dtype=np.float64).reshape(len(timestamps), len(CHANNELS))
+    return timestamps, values
+
+
+def _stream_sample_documents(user_ref, after, until):
+    query = user_ref.collection('pressureData')
+    if until is not None:
+        query = query.where('timestamp', '<=', until)
+    for snapshot in stream_range(query, after=after):
+        document = snapshot.to_dict()
+        yield document['timestamp'], [np.nan if document.get(channel) is None else document[channel] for channel in CHANNELS]
+
+
+def _stream_buckets(user_ref, resolution, after, until):
+    span = timedelta(seconds=BUCKET_SECONDS[resolution])
+    query = user_ref.collection(BUCKET_COLLECTIONS[resolution])
+    if until is not None:
+        query = query.where('start', '<=', until)
+    # Bucket documents are large, so they are paged in smaller steps than samples
+    for snapshot in stream_range(query, after=after - span if after is not None else None, page_size=20, field='start'):
+        timestamps, values = unpack_bucket(snapshot.to_dict())
+        for timestamp, row in zip(timestamps, values.tolist()):
+            if (after is None or timestamp > after) and (until is None or timestamp <= until):
+                yield timestamp, row
+
+
+def iter_pressure_samples(db, username, after=None, until=None):
+    """
+    Yield (timestamp, [p1..p6]) for every sample after `after` (exclusive)
+    up to `until`, oldest first, merged across both storage layouts. Holds at
+    most one bucket in memory, so it suits exports of a full history.
+    """
+    after = _as_utc(after) if after is not None else None
+    until = _as_utc(until) if until is not None else None
+    user_ref = db.collection('users').document(username)
+
+    streams = [_stream_sample_documents(user_ref, after, until)]
+    streams += [_stream_buckets(user_ref, resolution, after, until) for resolution in BUCKET_COLLECTIONS]
+
+    previous = None
+    for timestamp, row in heapq.merge(*streams, key=lambda sample: sample[0]):
+        # The same sample can exist in both layouts after a mode switch
+        if timestamp != previous:
+            yield timestamp, row
+        previous = timestamp
+
+
+def read_latest_pressure_samples(db, username, limit):
+    """
+    A user's newest `limit` samples, whenever they were taken.
+    """
+    return read_pressure_samples(db, username, datetime(1970, 1, 1, tzinfo=timezone.utc),
+                                 datetime(9999, 12, 31, tzinfo=timezone.utc), descending=True, limit=limit)
@@ -0,0 +1,82 @@
+"""
+Per-region statistics for a window of pressure samples.
+
+All six regions are summarised in one vectorized pass over the (N, 6) array
+that pressure_store.read_pressure_samples returns, so a foot heatmap needs one
+range read instead of one per region.
+"""
+
+import warnings
+
+import numpy as np
+
+from pressure_rollups import CHANNELS
+
+
+DEFAULT_PERCENTILES = [25, 75, 90, 95]
+
+# A gap longer than this between two samples means the insole stopped sending; the sample before it is credited with
+# the typical interval (at most this long) instead of the whole gap
+MAX_SAMPLE_GAP_SECONDS = 60.0
+
+
+def sample_durations(timestamps, max_gap_seconds=MAX_SAMPLE_GAP_SECONDS):
+    """
+    Seconds each sample stands for: the time until the next sample, with the
+    last sample (and any sample before a gap) taking the median interval.
+    """
+    if len(timestamps) < 2:
+        return np.zeros(len(timestamps))
+    epoch_seconds = np.array([timestamp.timestamp() for timestamp in timestamps])
+    intervals = np.diff(epoch_seconds)
+    typical = float(np.median(intervals))
+    durations = np.append(intervals, typical)
+    durations[durations > max_gap_seconds] = min(typical, max_gap_seconds)
+    return durations
+
+
+def _region_value(value):
+    return None if np.isnan(value) else float(value)
+
+
+def summarize_pressure(timestamps, values, threshold, percentiles=None):
+    """
+    Mean, median, percentiles, peak and time above threshold for every
+    region. Returns a dict of region -> stats; regions without readings get
+    None for each statistic.
+    """
+    percentiles = DEFAULT_PERCENTILES if percentiles is None else percentiles
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(CHANNELS))
+    durations = sample_durations(timestamps)
+
+    present = np.isfinite(values)
+    counts = present.sum(axis=0)
+    masked = np.where(present, values, np.nan)
+    above = present & (masked > threshold)
+
+    with warnings.catch_warnings():
+        # Regions without readings come out as NaN (reported as None) rather than a warning
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nanmean(masked, axis=0)
+        medians = np.nanmedian(masked, axis=0)
+        region_percentiles = np.full((len(percentiles), len(CHANNELS)), np.nan)
+        if percentiles and len(values):
+            region_percentiles = np.nanpercentile(masked, percentiles, axis=0)
+    peaks = np.where(present, values, -np.inf).max(axis=0, initial=-np.inf)
+
+    time_above = (above * durations[:, np.newaxis]).sum(axis=0)
+    fraction_above = np.divide(above.sum(axis=0), counts, out=np.zeros(len(CHANNELS)), where=counts > 0)
+
+    summary = {}
+    for index, channel in enumerate(CHANNELS):
+        has_data = counts[index] > 0
+        summary[channel] = {
+            'count': int(counts[index]),
+            'mean': _region_value(means[index]),
+            'median': _region_value(medians[index]),
+            'percentiles': {'%g' % q: _region_value(region_percentiles[row, index]) for row, q in enumerate(percentiles)},
+            'peak': float(peaks[index]) if has_data else None,
+            'timeAboveThresholdSeconds': float(time_above[index]),
+            'fractionAboveThreshold': float(fraction_above[index]),
+        }
+    return summary
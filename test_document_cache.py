@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+
+from document_cache import DocumentCache
+
+
+class Snapshot:
+    def __init__(self, data, reference=None):
+        self.exists = data is not None
+        self._data = data
+        self.reference = reference
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class Ref:
+    # Stands in for a DocumentReference: a path and a get() that counts reads
+    def __init__(self, path, data=None, delay=0.0):
+        self.path = path
+        self.data = data
+        self.delay = delay
+        self.reads = 0
+
+    def get(self):
+        self.reads += 1
+        data = self.data
+        time.sleep(self.delay)
+        return Snapshot(data)
+
+
+class Client:
+    # db.get_all: one round trip for many references, results in any order
+    def __init__(self):
+        self.batches = []
+
+    def get_all(self, refs):
+        self.batches.append([ref.path for ref in refs])
+        return [Snapshot(ref.data, ref) for ref in reversed(refs)]
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def test_reads_are_cached_until_invalidated(self):
+        cache = DocumentCache()
+        ref = Ref('users/alice', {'view_meals': True})
+        self.assertEqual(cache.get(ref), {'view_meals': True})
+        cached = cache.get(ref)
+        cached['view_meals'] = False
+        # Callers get copies
+        self.assertEqual(cache.get(ref), {'view_meals': True})
+        self.assertEqual(ref.reads, 1)
+
+        ref.data = {'view_meals': False}
+        cache.invalidate(ref)
+        self.assertEqual(cache.get(ref), {'view_meals': False})
+        self.assertEqual(ref.reads, 2)
+
+    def test_missing_document_is_cached_and_entries_expire(self):
+        cache = DocumentCache(ttl_seconds=0.05)
+        ref = Ref('users/nobody')
+        self.assertIsNone(cache.get(ref))
+        self.assertIsNone(cache.get(ref))
+        self.assertEqual(ref.reads, 1)
+        time.sleep(0.06)
+        cache.get(ref)
+        self.assertEqual(ref.reads, 2)
+
+    def test_concurrent_misses_share_one_read(self):
+        cache = DocumentCache()
+        ref = Ref('users/alice', {'notifications': True}, delay=0.05)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(ref))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(ref.reads, 1)
+        self.assertEqual(results, [{'notifications': True}] * 8)
+
+    def test_read_in_flight_during_invalidation_is_not_cached(self):
+        cache = DocumentCache()
+        ref = Ref('users/alice', {'fullName': 'Old'}, delay=0.05)
+        reader = threading.Thread(target=cache.get, args=(ref,))
+        reader.start()
+        time.sleep(0.01)
+        ref.data = {'fullName': 'New'}
+        cache.invalidate(ref)
+        reader.join()
+        ref.delay = 0
+        self.assertEqual(cache.get(ref), {'fullName': 'New'})
+
+    def test_get_all_reads_only_uncached_documents_in_one_batch(self):
+        cache = DocumentCache()
+        db = Client()
+        profile = Ref('users/alice', {'fullName': 'Alice'})
+        personal_info = Ref('users/alice/personal-metrics/personal-info', {'height': 170})
+        missing = Ref('users/alice/personal-metrics/other')
+        cache.get(profile)
+
+        self.assertEqual(cache.get_all(db, [profile, personal_info, missing]), [{'fullName': 'Alice'}, {'height': 170}, None])
+        self.assertEqual(db.batches, [[personal_info.path, missing.path]])
+        # Everything is cached now
+        cache.get_all(db, [profile, personal_info, missing])
+        self.assertEqual(len(db.batches), 1)
+
+    def test_zero_ttl_reads_through(self):
+        cache = DocumentCache(ttl_seconds=0)
+        ref = Ref('users/alice', {})
+        cache.get(ref)
+        cache.get(ref)
+        self.assertEqual(ref.reads, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
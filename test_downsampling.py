@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from downsampling import lttb_indexes, minmax_indexes, parse_max_points
+
+
+class TestDownsampling(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(544)
+        self.x = np.arange(10000, dtype=np.float64)
+        self.y = rng.normal(100, 10, size=(10000, 6))
+        self.y[4321, 3] = 400
+
+    def test_lttb_keeps_the_ends_and_the_spike(self):
+        keep = lttb_indexes(self.x, self.y, 500)
+        self.assertEqual(len(keep), 500)
+        self.assertEqual((keep[0], keep[-1]), (0, 9999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(4321, keep)
+
+    def test_minmax_keeps_every_extreme(self):
+        keep = minmax_indexes(self.x, self.y, 500)
+        self.assertLessEqual(len(keep), 500)
+        self.assertEqual(self.y[keep].max(axis=0).tolist(), self.y.max(axis=0).tolist())
+        self.assertEqual(self.y[keep].min(axis=0).tolist(), self.y.min(axis=0).tolist())
+
+    def test_short_series_are_returned_whole(self):
+        self.assertEqual(lttb_indexes(self.x[:50], self.y[:50], 500).tolist(), list(range(50)))
+
+    def test_parse_max_points(self):
+        self.assertEqual(parse_max_points({}), (None, 'lttb'))
+        self.assertEqual(parse_max_points({'max_points': '800', 'method': 'minmax'}), (800, 'minmax'))
+        with self.assertRaises(ValueError):
+            parse_max_points({'max_points': '2'})
+
+
+if __name__ == '__main__':
+    unittest.main()
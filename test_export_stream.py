@@ -0,0 +1,35 @@
+import csv
+import gzip
+import io
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from export_stream import export_chunks
+
+
+def records(count):
+    start = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+    for i in range(count):
+        yield {'timestamp': start + timedelta(minutes=i), 'glucose': float('nan') if i == 1 else 100 + i}
+
+
+class TestExportStream(unittest.TestCase):
+
+    def test_ndjson_with_gzip(self):
+        chunks = list(export_chunks(records(20000), 'ndjson', ['timestamp', 'glucose'], gzip=True))
+        self.assertGreater(len(chunks), 2)
+        lines = gzip.decompress(b''.join(chunks)).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 20000)
+        self.assertEqual(json.loads(lines[0]), {'timestamp': '2024-03-01T12:00:00+00:00', 'glucose': 100})
+        self.assertEqual(json.loads(lines[1])['glucose'], None)
+
+    def test_csv_has_a_header_even_when_empty(self):
+        rows = list(csv.reader(io.StringIO(b''.join(export_chunks(records(3), 'csv', ['timestamp', 'glucose'])).decode('utf-8'))))
+        self.assertEqual(rows, [['timestamp', 'glucose'], ['2024-03-01T12:00:00+00:00', '100'], ['2024-03-01T12:01:00+00:00', ''],
+                                ['2024-03-01T12:02:00+00:00', '102']])
+        self.assertEqual(b''.join(export_chunks(records(0), 'csv', ['timestamp', 'glucose'])), b'timestamp,glucose\r\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from latest_cache import LatestValueCache
+
+
+class TestLatestValueCache(unittest.TestCase):
+
+    def test_write_through_and_expiry(self):
+        cache = LatestValueCache(ttl_seconds=0.05)
+        now = datetime.now(timezone.utc)
+        self.assertIsNone(cache.get('alice'))
+
+        self.assertTrue(cache.put('alice', {'sweat_glucose': 80.0}, now))
+        self.assertEqual(cache.get('alice'), {'sweat_glucose': 80.0})
+
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('alice'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_older_reading_does_not_replace_newer(self):
+        cache = LatestValueCache()
+        now = datetime.now(timezone.utc)
+        cache.put('alice', 'new', now)
+        # e.g. a Firestore fallback read that started before the write
+        self.assertFalse(cache.put('alice', 'old', now - timedelta(seconds=1)))
+        self.assertEqual(cache.get('alice'), 'new')
+
+        cache.invalidate('alice')
+        self.assertIsNone(cache.get('alice'))
+
+    def test_least_recently_used_user_is_dropped(self):
+        cache = LatestValueCache(max_users=2)
+        now = datetime.now(timezone.utc)
+        cache.put('alice', 1, now)
+        cache.put('bob', 2, now)
+        cache.get('alice')
+        cache.put('carol', 3, now)
+        self.assertIsNone(cache.get('bob'))
+        self.assertEqual(cache.get('alice'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
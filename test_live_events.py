@@ -0,0 +1,74 @@
+import json
+import threading
+import unittest
+
+from live_events import LiveEventHub, format_event
+
+
+def data_of(message):
+    return json.loads(message.split('data: ', 1)[1])
+
+
+class TestLiveEvents(unittest.TestCase):
+
+    def test_event_is_a_single_sse_message(self):
+        message = format_event(7, 'glucose', {'sweat_glucose': 80.5})
+        self.assertEqual(message, 'id: 7\nevent: glucose\ndata: {"sweat_glucose":80.5}\n\n')
+
+    def test_publish_fans_out_to_every_subscriber(self):
+        hub = LiveEventHub(queue_size=4, heartbeat_seconds=0.01)
+        first, second = hub.stream('alice'), hub.stream('alice')
+        next(first), next(second)
+
+        self.assertEqual(hub.publish('alice', 'glucose', {'value': 1}), 2)
+        self.assertEqual(hub.publish('bob', 'glucose', {'value': 2}), 0)
+        self.assertEqual(data_of(next(first)), {'value': 1})
+        self.assertEqual(data_of(next(second)), {'value': 1})
+
+        first.close()
+        self.assertEqual(hub.stats()['subscribers'], 1)
+
+    def test_idle_stream_sends_keepalives(self):
+        hub = LiveEventHub(heartbeat_seconds=0.01)
+        stream = hub.stream('alice')
+        self.assertIn('retry:', next(stream))
+        self.assertEqual(next(stream), ': keepalive\n\n')
+
+    def test_slow_subscriber_drops_oldest_then_is_reset(self):
+        hub = LiveEventHub(queue_size=3, heartbeat_seconds=0.01)
+        stream = hub.stream('alice')
+        next(stream)
+
+        for value in range(5):
+            hub.publish('alice', 'pressure', {'value': value})
+        # Two events were dropped to make room; the newest three are kept
+        self.assertEqual(data_of(next(stream)), {'value': 2})
+        self.assertEqual(hub.stats()['dropped'], 2)
+
+        # Falling a whole queue behind disconnects the client
+        for value in range(10):
+            hub.publish('alice', 'pressure', {'value': value})
+        self.assertIn('event: reset', next(stream))
+        with self.assertRaises(StopIteration):
+            next(stream)
+        self.assertEqual(hub.stats()['subscribers'], 0)
+        self.assertEqual(hub.publish('alice', 'pressure', {}), 0)
+
+    def test_publish_never_blocks_on_a_full_queue(self):
+        hub = LiveEventHub(queue_size=1)
+        hub.subscribe('alice')
+        publisher = threading.Thread(target=lambda: [hub.publish('alice', 'pressure', {}) for _ in range(100)])
+        publisher.start()
+        publisher.join(timeout=5)
+        self.assertFalse(publisher.is_alive())
+
+    def test_oldest_stream_is_replaced_past_the_limit(self):
+        hub = LiveEventHub(max_subscribers=1)
+        first = hub.subscribe('alice')
+        hub.subscribe('alice')
+        self.assertTrue(first.closed)
+        self.assertEqual(hub.stats()['subscribers'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from numpy_model import NPZ_PATH, SCALER_X_NPZ_PATH, SCALER_Y_NPZ_PATH, NumpyGlucoseModel, NumpyMinMaxScaler
+
+EXPECTED_COLS = ['glucose_level_value', 'finger_stick_value', 'basal_value', 'basis_gsr_value', 'basis_skin_temperature_value', 'bolus_dose']
+
+
+class TestNumpyModel(unittest.TestCase):
+
+    def setUp(self):
+        self.model = NumpyGlucoseModel.load(NPZ_PATH)
+        self.scaler_x = NumpyMinMaxScaler.load(SCALER_X_NPZ_PATH)
+        self.scaler_y = NumpyMinMaxScaler.load(SCALER_Y_NPZ_PATH)
+        self.training_rows = pd.read_csv('544-ws-training.csv')[EXPECTED_COLS].to_numpy()
+
+    def test_scalers_match_pickled_min_max_scalers(self):
+        pickled_x = joblib.load('544_scaler_x.pkl')
+        pickled_y = joblib.load('544_scaler_y.pkl')
+        X = pd.DataFrame(self.training_rows, columns=EXPECTED_COLS)
+        np.testing.assert_allclose(self.scaler_x.transform(X), pickled_x.transform(X), rtol=1e-12)
+        y = np.linspace(0, 1, 11).reshape(-1, 1)
+        np.testing.assert_allclose(self.scaler_y.inverse_transform(y), pickled_y.inverse_transform(y), rtol=1e-12)
+
+    def test_h5_and_npz_weights_agree(self):
+        from_h5 = NumpyGlucoseModel.load('544_trained_model.h5')
+        scaled = self.scaler_x.transform(self.training_rows)[:, np.newaxis, :]
+        np.testing.assert_array_equal(from_h5.predict(scaled), self.model.predict(scaled))
+
+    def test_matches_keras_prediction(self):
+        # Same example row as test_model.py; Keras predicts 155.1201 mg/dL for it
+        row = np.array([[136.8153, 0, 0.2, 0.1, 32, 0]])
+        prediction = self.scaler_y.inverse_transform(self.model.predict(self.scaler_x.transform(row)[:, np.newaxis, :]))
+        self.assertAlmostEqual(prediction.flatten()[0], 155.1201, places=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
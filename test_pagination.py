@@ -0,0 +1,29 @@
+import unittest
+from datetime import datetime, timezone
+
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, parse_page
+
+
+class TestPagination(unittest.TestCase):
+
+    def test_cursor_round_trip(self):
+        timestamp = datetime(2024, 3, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+        cursor = encode_cursor(timestamp, 'Xk2pQ9')
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (timestamp, 'Xk2pQ9'))
+        self.assertEqual(decode_cursor(encode_cursor(timestamp)), (timestamp, None))
+
+    def test_bad_cursors_are_rejected(self):
+        for cursor in ['not-a-cursor', encode_cursor(datetime(2024, 3, 1))[:-3], 'e30']:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(parse_page({'page_size': str(MAX_PAGE_SIZE * 10)})[0], MAX_PAGE_SIZE)
+        self.assertEqual(parse_page({}, default_page_size=10), (10, None))
+        with self.assertRaises(ValueError):
+            parse_page({'page_size': '0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from personal_metrics import PERSONAL_METRICS_SCHEMA, MetricsValidationError, validate_metrics
+
+
+class TestPersonalMetrics(unittest.TestCase):
+
+    def test_any_subset_of_fields_is_accepted(self):
+        fields = {'height': 180, 'weight': '72.5', 'allergies': ['peanuts'], 'stress_level': 'High', 'illness': False, 'medication': None}
+        self.assertEqual(validate_metrics(fields), fields)
+
+    def test_every_bad_field_is_reported(self):
+        with self.assertRaises(MetricsValidationError) as context:
+            validate_metrics({'height': 'tall', 'weight': True, 'shoe_size': 9, 'stress_level': {'level': 3}, 'bolus_dose': 2})
+        self.assertEqual([error['field'] for error in context.exception.errors], ['height', 'weight', 'shoe_size', 'stress_level'])
+
+    def test_empty_or_non_object_body_is_rejected(self):
+        for fields in ({}, None, ['height']):
+            with self.assertRaises(MetricsValidationError):
+                validate_metrics(fields)
+
+    def test_schema_covers_the_update_routes(self):
+        self.assertIn('insulin_dosage', PERSONAL_METRICS_SCHEMA)
+        self.assertIn('blood_glucose_level', PERSONAL_METRICS_SCHEMA)
+        self.assertEqual(len(PERSONAL_METRICS_SCHEMA), 23)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from pressure_ring import PressureRingStore
+from pressure_rollups import PressureStats, compute_rollups, rollup_cover
+from pressure_summary import summarize_pressure
+from pressure_store import MAX_BUCKET_SAMPLES, PressureValidationError, group_by_bucket, merge_bucket, pack_pressure_frame, parse_pressure_frame, parse_pressure_samples, sample_document_id, unpack_bucket
+
+
+def sample(timestamp, value=100):
+    return dict({'timestamp': timestamp}, **{'p%d' % i: value + i for i in range(1, 7)})
+
+
+class TestPressureStore(unittest.TestCase):
+
+    def test_parse_pressure_samples(self):
+        timestamps, values = parse_pressure_samples([sample('2024-03-01T12:00:00'), sample(1709294400.5)])
+        self.assertEqual(timestamps[0], datetime(2024, 3, 1, 12, tzinfo=timezone.utc))
+        self.assertEqual(values.shape, (2, 6))
+        self.assertEqual(values[1].tolist(), [101, 102, 103, 104, 105, 106])
+
+    def test_every_invalid_sample_is_reported(self):
+        bad_value = sample('2024-03-01T12:00:00')
+        bad_value['p3'] = 'high'
+        missing = sample('2024-03-01T12:00:01')
+        del missing['p6']
+        with self.assertRaises(PressureValidationError) as context:
+            parse_pressure_samples([sample('not a time'), missing, sample('2024-03-01T12:00:02'), bad_value])
+        self.assertEqual([error['index'] for error in context.exception.errors], [0, 1, 3])
+
+    def test_duplicate_timestamps_are_rejected(self):
+        # The same instant written two ways would map to one document id
+        with self.assertRaises(PressureValidationError) as context:
+            parse_pressure_samples([sample('2024-03-01T12:00:00'), sample('2024-03-01T12:00:01'), sample(1709294400)])
+        self.assertEqual(context.exception.errors, [{'index': 2, 'message': "duplicate timestamp, also used by sample 0"}])
+
+    def test_binary_frame_decodes_without_copying(self):
+        rows = np.arange(600, dtype=np.float32).reshape(100, 6)
+        frame = pack_pressure_frame(1709294400.0, 50.0, rows)
+        timestamps, values = parse_pressure_frame(frame)
+        self.assertFalse(values.flags.owndata)
+        self.assertEqual(values.tolist(), rows.tolist())
+        self.assertEqual(timestamps[0], datetime(2024, 3, 1, 12, tzinfo=timezone.utc))
+        self.assertEqual(timestamps[99] - timestamps[98], timedelta(milliseconds=20))
+
+        with self.assertRaises(ValueError):
+            parse_pressure_frame(frame[:-4])
+        rows[7, 2] = np.inf
+        with self.assertRaises(PressureValidationError) as context:
+            parse_pressure_frame(pack_pressure_frame(1709294400.0, 50.0, rows))
+        self.assertEqual(context.exception.errors[0]['index'], 7)
+
+    def test_document_ids_are_deterministic(self):
+        timestamp = datetime(2024, 3, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+        self.assertEqual(sample_document_id(timestamp), '1709294400250000')
+
+    def test_buckets_round_trip_and_merge_idempotently(self):
+        timestamps, values = parse_pressure_samples([sample(1709294400 + 0.25 * i, i) for i in range(480)])
+        groups = group_by_bucket(timestamps, 'minute')
+        self.assertEqual([len(indexes) for indexes in groups.values()], [240, 240])
+
+        start, indexes = next(iter(groups.items()))
+        self.assertEqual(start, datetime(2024, 3, 1, 12, tzinfo=timezone.utc))
+        bucket = merge_bucket(None, start, 'minute', [timestamps[i] for i in indexes[:200]], values[indexes[:200]].tolist())
+        # Re-sending an overlapping range replaces those samples instead of duplicating them
+        bucket = merge_bucket(bucket, start, 'minute', [timestamps[i] for i in indexes[100:]], values[indexes[100:]].tolist())
+        self.assertEqual(bucket['count'], 240)
+        self.assertEqual(bucket['end'], start + timedelta(minutes=1))
+
+        unpacked_timestamps, unpacked_values = unpack_bucket(bucket)
+        self.assertEqual(unpacked_timestamps, [timestamps[i] for i in indexes])
+        self.assertEqual(unpacked_values.tolist(), values[indexes].tolist())
+
+    def test_full_bucket_stays_under_the_index_entry_limit(self):
+        # offsets and p1..p6 are indexed element by element
+        self.assertLessEqual(7 * MAX_BUCKET_SAMPLES, 40000)
+        start = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+        timestamps = [start + timedelta(microseconds=i) for i in range(MAX_BUCKET_SAMPLES + 1)]
+        with self.assertRaises(ValueError):
+            merge_bucket(None, start, 'minute', timestamps, np.zeros((len(timestamps), 6)).tolist())
+
+    def test_rollups_combine_to_the_raw_statistics(self):
+        timestamps, values = parse_pressure_samples([sample(1709332200 + 7 * i, i % 250) for i in range(1000)])
+        rollups = compute_rollups(timestamps, values)
+        for resolution in ('minute', 'hour', 'day'):
+            combined = PressureStats()
+            for (rollup_resolution, _), stats in rollups.items():
+                if rollup_resolution == resolution:
+                    combined.merge(stats)
+            self.assertEqual(combined.count.tolist(), [1000] * 6)
+            self.assertTrue(np.allclose(combined.mean(), values.mean(axis=0)))
+            self.assertTrue(np.allclose(combined.variance(), values.var(axis=0)))
+            self.assertEqual(combined.max.tolist(), values.max(axis=0).tolist())
+
+    def test_rollup_cover_uses_the_coarsest_pieces(self):
+        start = datetime(2024, 3, 1, 22, 21, tzinfo=timezone.utc)
+        end = datetime(2024, 3, 3, 3, 1, tzinfo=timezone.utc)
+        self.assertEqual([(resolution, lo.isoformat(), hi.isoformat()) for resolution, lo, hi in rollup_cover(start, end)], [
+            ('minute', '2024-03-01T22:21:00+00:00', '2024-03-01T23:00:00+00:00'),
+            ('hour', '2024-03-01T23:00:00+00:00', '2024-03-02T00:00:00+00:00'),
+            ('day', '2024-03-02T00:00:00+00:00', '2024-03-03T00:00:00+00:00'),
+            ('hour', '2024-03-03T00:00:00+00:00', '2024-03-03T03:00:00+00:00'),
+            ('minute', '2024-03-03T03:00:00+00:00', '2024-03-03T03:01:00+00:00'),
+        ])
+
+    def test_summary_covers_every_region_in_one_pass(self):
+        timestamps, values = parse_pressure_samples([sample(1709294400 + i, 30 * i) for i in range(10)])
+        values[:, 5] = np.nan
+        summary = summarize_pressure(timestamps, values, threshold=200, percentiles=[50, 90])
+
+        self.assertEqual(summary['p1']['count'], 10)
+        self.assertAlmostEqual(summary['p1']['mean'], values[:, 0].mean())
+        self.assertEqual(summary['p1']['percentiles'], {'50': np.median(values[:, 0]), '90': np.percentile(values[:, 0], 90)})
+        self.assertEqual(summary['p1']['peak'], 271)
+        # 211, 241 and 271 kPa, one second each
+        self.assertEqual(summary['p1']['timeAboveThresholdSeconds'], 3.0)
+        self.assertEqual(summary['p6']['mean'], None)
+
+    def test_ring_buffer_answers_latest_queries_from_memory(self):
+        timestamps, values = parse_pressure_samples([sample(1709294400 + i, i) for i in range(300)])
+        store = PressureRingStore(capacity=100, max_users=4)
+        loads = []
+
+        def load(limit):
+            loads.append(limit)
+            return timestamps[-limit:], values[-limit:]
+
+        latest_timestamps, latest_values = store.latest('patient', timestamps[0], timestamps[-1], 50, load)
+        self.assertEqual(loads, [100])
+        self.assertEqual(latest_timestamps, timestamps[-50:])
+        self.assertEqual(latest_values.tolist(), values[-50:].tolist())
+
+        more_timestamps, more_values = parse_pressure_samples([sample(1709294700 + i, i) for i in range(10)])
+        store.append('patient', more_timestamps, more_values)
+        latest_timestamps, _ = store.latest('patient', timestamps[0], more_timestamps[-1], 50, load)
+        self.assertEqual(latest_timestamps, (timestamps + more_timestamps)[-50:])
+        self.assertEqual(loads, [100])
+
+        # Older than anything held: the caller has to go to Firestore
+        self.assertIsNone(store.latest('patient', timestamps[0], timestamps[50], 50, load))
+
+        # Recent values come from memory only
+        self.assertEqual(store.recent('patient', more_timestamps[5]).tolist(), more_values[5:].tolist())
+        self.assertEqual(store.recent('nobody', timestamps[0]).shape, (0, 6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import threading
+import unittest
+
+from write_coalescer import WriteCoalescer
+
+
+class TestWriteCoalescer(unittest.TestCase):
+
+    def setUp(self):
+        self.writes = []
+        self.documents = {'alice'}
+
+    def write(self, key, fields):
+        if key not in self.documents:
+            return False
+        self.writes.append((key, dict(fields)))
+        return True
+
+    def test_burst_is_merged_into_one_trailing_write(self):
+        coalescer = WriteCoalescer(self.write, window_seconds=60)
+        self.assertTrue(coalescer.submit('alice', {'stress_level': 1}))
+        self.assertTrue(coalescer.submit('alice', {'stress_level': 2, 'activity_intensity': 'Low'}))
+        self.assertTrue(coalescer.submit('alice', {'activity_duration': 30}))
+
+        # Read-your-writes before the buffer is written
+        self.assertEqual(coalescer.pending('alice'), {'stress_level': 2, 'activity_intensity': 'Low', 'activity_duration': 30})
+        self.assertEqual(len(self.writes), 1)
+
+        # What the window's timer does when it fires
+        coalescer.flush('alice')
+        self.assertEqual(self.writes, [
+            ('alice', {'stress_level': 1}),
+            ('alice', {'stress_level': 2, 'activity_intensity': 'Low', 'activity_duration': 30}),
+        ])
+        self.assertEqual(coalescer.pending('alice'), {})
+
+    def test_failed_direct_write_does_not_open_a_window(self):
+        def failing_write(key, fields):
+            raise TimeoutError('deadline exceeded')
+
+        coalescer = WriteCoalescer(failing_write, window_seconds=60)
+        with self.assertRaises(TimeoutError):
+            coalescer.submit('alice', {'weight': 70})
+        # The next update is written directly, so its caller sees the failure too
+        with self.assertRaises(TimeoutError):
+            coalescer.submit('alice', {'weight': 71})
+        self.assertEqual(coalescer.stats()['buffered'], 0)
+
+    def test_missing_document_is_reported_on_direct_write(self):
+        coalescer = WriteCoalescer(self.write, window_seconds=60)
+        self.assertFalse(coalescer.submit('bob', {'height': 180}))
+        # A failed write doesn't open a window, so the next update is reported too
+        self.assertFalse(coalescer.submit('bob', {'height': 180}))
+        self.assertEqual(coalescer.pending('bob'), {})
+
+    def test_failed_flush_is_buffered_again_and_retried(self):
+        failures = [TimeoutError('deadline exceeded')]
+
+        def flaky_write(key, fields):
+            if 'stress_level' in fields and failures:
+                raise failures.pop()
+            return self.write(key, fields)
+
+        coalescer = WriteCoalescer(flaky_write, window_seconds=60, max_retries=1)
+        coalescer.submit('alice', {'weight': 70})
+        coalescer.submit('alice', {'stress_level': 1, 'weight': 71})
+        coalescer.flush('alice')
+        # Still visible to reads, and a newer value buffered meanwhile wins over the failed one
+        self.assertEqual(coalescer.pending('alice'), {'stress_level': 1, 'weight': 71})
+        coalescer.submit('alice', {'weight': 72})
+        coalescer.flush('alice')
+        self.assertEqual(self.writes[-1], ('alice', {'stress_level': 1, 'weight': 72}))
+        self.assertEqual(coalescer.stats()['retriedFlushes'], 1)
+        self.assertEqual(coalescer.stats()['failedFlushes'], 0)
+
+    def test_flush_gives_up_after_max_retries(self):
+        def failing_write(key, fields):
+            if 'weight' in fields and fields['weight'] > 70:
+                raise TimeoutError('deadline exceeded')
+            return True
+
+        coalescer = WriteCoalescer(failing_write, window_seconds=60, max_retries=2)
+        coalescer.submit('alice', {'weight': 70})
+        coalescer.submit('alice', {'weight': 71})
+        coalescer.flush_all()
+        self.assertEqual(coalescer.pending('alice'), {})
+        self.assertEqual(coalescer.stats()['retriedFlushes'], 2)
+        self.assertEqual(coalescer.stats()['failedFlushes'], 1)
+
+    def test_flush_all_writes_buffered_updates(self):
+        coalescer = WriteCoalescer(self.write, window_seconds=60)
+        coalescer.submit('alice', {'weight': 70})
+        coalescer.submit('alice', {'weight': 71})
+        coalescer.flush_all()
+        self.assertEqual(self.writes[-1], ('alice', {'weight': 71}))
+        self.assertEqual(coalescer.stats()['buffered'], 0)
+
+    def test_zero_window_writes_every_update(self):
+        coalescer = WriteCoalescer(self.write, window_seconds=0)
+        for weight in range(3):
+            coalescer.submit('alice', {'weight': weight})
+        self.assertEqual(len(self.writes), 3)
+
+    def test_writes_for_a_key_are_ordered(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(key, fields):
+            if 'first' in fields:
+                started.set()
+                release.wait(5)
+            self.writes.append(fields)
+            return True
+
+        coalescer = WriteCoalescer(slow_write, window_seconds=60)
+        direct = threading.Thread(target=coalescer.submit, args=('alice', {'first': 1}))
+        direct.start()
+        self.assertTrue(started.wait(5))
+
+        # Buffered while the first write is in flight; its flush has to wait for that write
+        coalescer.submit('alice', {'second': 2})
+        flusher = threading.Thread(target=coalescer.flush, args=('alice',))
+        flusher.start()
+        release.set()
+        direct.join(5)
+        flusher.join(5)
+        self.assertEqual(self.writes, [{'first': 1}, {'second': 2}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+In-memory columnar copy of 544-ws-training.csv.
+
+The CSV is parsed once per worker into typed NumPy columns and reused until its
+mtime or size changes. Every successful parse also writes an uncompressed .npz
+sidecar, which later workers load instead of re-parsing the CSV. Pre-build it
+with:
+
+    python training_data.py
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+TRAINING_CSV_PATH = '544-ws-training.csv'
+
+
+def _sidecar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.npz'
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def _to_column(series):
+    # Keep numbers numeric, parse the timestamp column, and store text as fixed-width
+    # unicode so the sidecar can be loaded without pickle
+    if series.name == 'time':
+        return pd.to_datetime(series).to_numpy(dtype='datetime64[s]')
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy()
+    return series.astype(str).to_numpy(dtype=str)
+
+
+class TrainingData:
+    """
+    Read-only snapshot of the training columns. Indexing returns the NumPy
+    column itself, so slices such as data['glucose_level_value'][-5:] are views.
+    """
+
+    def __init__(self, columns, signature):
+        self.columns = columns
+        self.signature = signature
+        for column in columns.values():
+            column.flags.writeable = False
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def tail(self, name, n):
+        return self.columns[name][-n:]
+
+
+class TrainingDataStore:
+    def __init__(self, csv_path=TRAINING_CSV_PATH, write_sidecar=True):
+        self.csv_path = csv_path
+        self.sidecar_path = _sidecar_path(csv_path)
+        self.write_sidecar = write_sidecar
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _load_sidecar(self, signature):
+        try:
+            with np.load(self.sidecar_path, allow_pickle=False) as npz:
+                if not np.array_equal(npz['__source_signature__'], signature):
+                    return None
+                return {name: npz[name] for name in npz.files if name != '__source_signature__'}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _parse_csv(self, signature):
+        frame = pd.read_csv(self.csv_path)
+        columns = {name: _to_column(frame[name]) for name in frame.columns}
+
+        if self.write_sidecar:
+            # Written to a temp file first so concurrent workers never see half a sidecar
+            tmp_path = self.sidecar_path + '.%d.tmp' % os.getpid()
+            try:
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, __source_signature__=signature, **columns)
+                os.replace(tmp_path, self.sidecar_path)
+            except OSError:
+                # A read-only deploy directory just means every worker parses the CSV
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return columns
+
+    def get(self):
+        """
+        Return the current TrainingData, reloading it if the CSV has changed.
+        """
+        signature = _source_signature(self.csv_path)
+        data = self._data
+        if data is not None and np.array_equal(data.signature, signature):
+            return data
+
+        with self._lock:
+            if self._data is not None and np.array_equal(self._data.signature, signature):
+                return self._data
+            columns = self._load_sidecar(signature)
+            if columns is None:
+                columns = self._parse_csv(signature)
+            self._data = TrainingData(columns, signature)
+            return self._data
+
+
+training_data_store = TrainingDataStore()
+
+
+if __name__ == '__main__':
+    print("Loaded", len(training_data_store.get()), "rows; sidecar at", training_data_store.sidecar_path)
@@ -0,0 +1,163 @@
+"""
+Merges bursts of field updates to the same document into fewer writes.
+
+The first update for a key is written straight away, so its caller still
+learns whether the document exists. Updates arriving within window_seconds of
+the last write are merged into a buffer and acknowledged at once; a timer
+writes the buffer as a single update when the window closes. Sliders that
+fire an update per step cost two writes per window instead of one per step.
+
+Writes for one key happen one at a time and in order. pending() returns
+fields that were accepted but aren't confirmed written yet, so reads in the
+same process can overlay them (read-your-writes).
+
+A trailing write that fails puts its fields back into the buffer, under any
+newer updates, and is retried one window later, up to max_retries times.
+Updates are lost only when every retry fails (counted in failedFlushes), or
+when the worker dies before the buffer is written. Call flush_all() at
+shutdown so nothing buffered is left behind; a worker that is killed outright
+can still lose up to one window of updates.
+"""
+
+import threading
+import time
+
+
+class _KeyState:
+    def __init__(self):
+        self.last_write = float('-inf')
+        self.buffer = {}
+        self.inflight = {}
+        self.timer = None
+        # Trailing writes in a row that have failed
+        self.retries = 0
+        self.write_lock = threading.Lock()
+
+
+class WriteCoalescer:
+    def __init__(self, write, window_seconds=0.3, max_retries=3):
+        # write(key, fields) -> False when the document doesn't exist
+        self.write = write
+        self.window_seconds = window_seconds
+        self.max_retries = max_retries
+        self._states = {}
+        self._lock = threading.Lock()
+
+        self.direct_writes = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.retried_flushes = 0
+        self.failed_flushes = 0
+
+    def submit(self, key, fields):
+        """
+        Apply an update. Returns False only when a direct write found the
+        document missing; buffered updates return True.
+        """
+        with self._lock:
+            state = self._states.setdefault(key, _KeyState())
+            now = time.monotonic()
+            if self.window_seconds > 0 and (state.buffer or now - state.last_write < self.window_seconds):
+                state.buffer.update(fields)
+                self.coalesced += 1
+                self._schedule(key, state, max(0.0, state.last_write + self.window_seconds - now))
+                return True
+            state.last_write = now
+            state.inflight.update(fields)
+            self.direct_writes += 1
+
+        written = False
+        with state.write_lock:
+            try:
+                written = self.write(key, fields)
+            finally:
+                with self._lock:
+                    self._settle(state, fields)
+                    if not written:
+                        # Nothing was written (missing document, or the write raised), so the next update
+                        # must be written directly too rather than buffered and acknowledged
+                        state.last_write = float('-inf')
+        return written
+
+    def _schedule(self, key, state, delay):
+        # One timer per key writes whatever is buffered when it fires
+        if state.timer is None:
+            state.timer = threading.Timer(delay, self.flush, [key])
+            state.timer.daemon = True
+            state.timer.start()
+
+    def _settle(self, state, fields):
+        # Fields confirmed written (or rejected) stop being overlaid, unless a newer update re-set them since
+        for field, value in fields.items():
+            if field in state.inflight and state.inflight[field] is value:
+                del state.inflight[field]
+
+    def flush(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            if state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+            fields, state.buffer = state.buffer, {}
+            if not fields:
+                return
+            state.inflight.update(fields)
+            state.last_write = time.monotonic()
+            self.flushes += 1
+
+        written = False
+        with state.write_lock:
+            try:
+                written = self.write(key, fields)
+            except Exception as e:
+                print(f"Error flushing buffered update for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._settle(state, fields)
+                    if written:
+                        state.retries = 0
+                    elif state.retries < self.max_retries:
+                        # Callers were already told these fields were saved: buffer them again, under
+                        # anything newer that arrived meanwhile, and try once more after a window
+                        state.retries += 1
+                        state.buffer = {**fields, **state.buffer}
+                        self.retried_flushes += 1
+                        self._schedule(key, state, self.window_seconds)
+                    else:
+                        state.retries = 0
+                        self.failed_flushes += 1
+
+    def flush_all(self):
+        # Called at shutdown: write everything still buffered, retrying failed writes straight away
+        for _ in range(self.max_retries + 1):
+            with self._lock:
+                keys = [key for key, state in self._states.items() if state.buffer]
+            if not keys:
+                return
+            for key in keys:
+                self.flush(key)
+
+    def pending(self, key):
+        """
+        Fields accepted for `key` that aren't confirmed written yet, newest
+        value winning.
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return {}
+            return {**state.inflight, **state.buffer}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'windowSeconds': self.window_seconds,
+                'buffered': sum(1 for state in self._states.values() if state.buffer),
+                'directWrites': self.direct_writes,
+                'coalescedUpdates': self.coalesced,
+                'flushes': self.flushes,
+                'retriedFlushes': self.retried_flushes,
+                'failedFlushes': self.failed_flushes,
+            }